@@ -0,0 +1 @@
+"""Offline benchmark suite: simulated server, synthetic inputs and a runner"""
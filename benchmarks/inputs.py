@@ -0,0 +1,60 @@
+"""Synthetic urls_to_test.xlsx / sitemaps.xlsx inputs pointing at the simulated server"""
+
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from .sim_server import loopback_hosts
+
+
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+SITEMAP_SIZE = 50000  # URLs per sitemap (the sitemap protocol limit)
+
+
+def parse_scale(value: str) -> int:
+    """'100k' -> 100000; plain numbers are accepted too"""
+    value = value.lower()
+    return SCALES[value] if value in SCALES else int(value)
+
+
+def defined_list(work_dir: Path, count: int, hosts: int, port: int) -> Path:
+    """
+    Write (or reuse) a urls_to_test.xlsx with `count` URLs spread over `hosts` hosts
+
+    Files are named after their parameters, so the 1M-row workbook is
+    only generated once.
+    """
+    path = work_dir / f"urls_{count}_h{hosts}_p{port}.xlsx"
+    if path.exists():
+        return path
+
+    addresses = loopback_hosts(hosts)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['root', 'url'])
+    ws.append([f"http://{addresses[0]}:{port}", '/p/0'])
+    for n in range(1, count):
+        if hosts == 1:
+            ws.append([None, f"/p/{n}"])
+        else:
+            ws.append([None, f"http://{addresses[n % hosts]}:{port}/p/{n}"])
+
+    temp_path = path.with_name(path.name + '.part')
+    wb.save(temp_path)
+    temp_path.replace(path)
+    return path
+
+
+def sitemap_list(work_dir: Path, count: int, port: int, gzip: bool = False) -> Path:
+    """Write a sitemaps.xlsx listing simulated sitemaps that together hold `count` URLs"""
+    path = work_dir / f"sitemaps_{count}_p{port}{'_gz' if gzip else ''}.xlsx"
+    suffix = '.xml.gz' if gzip else '.xml'
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['sitemap_url'])
+    for start in range(0, count, SITEMAP_SIZE):
+        size = min(SITEMAP_SIZE, count - start)
+        ws.append([f"http://127.0.0.1:{port}/sitemap/{start}-{size}{suffix}"])
+    wb.save(path)
+    return path
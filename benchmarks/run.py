@@ -0,0 +1,242 @@
+"""
+Benchmark runner
+
+Starts the simulated server, generates the inputs and runs the full
+application once per engine and configuration, each in a fresh process
+so peak memory and CPU time are measured per run. Results are written
+as JSON and can be compared with an earlier file:
+
+    python -m benchmarks.run --scale 1k,100k --engines threaded,asyncio
+    python -m benchmarks.run --scale 100k --compare benchmark_results_old.json
+
+Everything runs against loopback addresses; no network access is needed.
+"""
+
+import argparse
+import ast
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows: memory and CPU are then not reported
+    resource = None
+
+from .inputs import defined_list, parse_scale, sitemap_list
+from .sim_server import PROFILES, serve
+
+
+CONFIGS = {
+    'default': {},
+    'head': {'check_method': 'head'},
+    'stream': {'check_method': 'stream'},
+    'workers200': {'max_workers': 200},
+}
+INPUT_FILES = {'defined': 'urls_to_test.xlsx', 'sitemap': 'sitemaps.xlsx'}
+CASE_KEY = ('mode', 'scale', 'profile', 'engine', 'config')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the URL tester against a simulated server")
+    parser.add_argument("--scale", default="1k", help="comma-separated URL counts: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--mode", default="defined", choices=sorted(INPUT_FILES),
+                        help="input type: defined list (xlsx) or sitemaps served by the simulated server")
+    parser.add_argument("--engines", default="threaded", help="comma-separated engines")
+    parser.add_argument("--configs", default="default", help=f"comma-separated presets: {', '.join(CONFIGS)}")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="TestConfig override applied to every run (repeatable)")
+    parser.add_argument("--profile", default="realistic", help=f"server profile: {', '.join(PROFILES)} "
+                                                                "or a JSON object of ServerProfile fields")
+    parser.add_argument("--hosts", type=int, default=1, help="loopback hosts the URLs are spread over")
+    parser.add_argument("--port", type=int, default=18765, help="simulated server port")
+    parser.add_argument("--gzip", action="store_true", help="serve gzip-compressed sitemaps")
+    parser.add_argument("--work-dir", default="benchmark_work", help="where generated inputs are kept")
+    parser.add_argument("--output", default=None, help="results file (default: benchmark_results_<time>.json)")
+    parser.add_argument("--compare", metavar="RESULTS", help="earlier results file to compare against")
+    return parser.parse_args()
+
+
+def parse_options(options):
+    """KEY=VALUE strings -> dict, values parsed as Python literals where possible"""
+    parsed = {}
+    for option in options:
+        key, _, value = option.partition('=')
+        try:
+            parsed[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            parsed[key] = value
+    return parsed
+
+
+def profile_settings(name: str) -> dict:
+    if name in PROFILES:
+        return PROFILES[name].to_dict()
+    return json.loads(name)
+
+
+def run_case(case: dict, input_path: str, results):
+    """Process entry point: run the application once and report its measurements"""
+    # Imported in the child so only the measured run's modules count towards its memory
+    from src.application import URLTestApplication
+    from src.models import TestConfig
+
+    run_dir = tempfile.mkdtemp(prefix='url_tester_bench_')
+    os.chdir(run_dir)
+    shutil.copyfile(input_path, INPUT_FILES[case['mode']])
+    config = TestConfig(engine=case['engine'], **case['options'])
+
+    app = URLTestApplication(case['mode'], config)
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        app.run()
+    elapsed = time.perf_counter() - start
+
+    latency = app.tester_service.latency
+    total = latency.phases['total']
+    measurement = {
+        'urls': total.count,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total.count / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(total.percentile(50), 1),
+        'p99_ms': round(total.percentile(99), 1),
+        'ttfb_p99_ms': round(latency.phases['ttfb'].percentile(99), 1),
+        'statuses': {status: histogram.count for status, histogram in sorted(latency.by_status.items())},
+        'peak_rss_mb': None,
+        'cpu_s': None,
+    }
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        rss_bytes = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        measurement['peak_rss_mb'] = round(rss_bytes / 2 ** 20, 1)
+        measurement['cpu_s'] = round(usage.ru_utime + usage.ru_stime, 2)
+
+    os.chdir(tempfile.gettempdir())
+    shutil.rmtree(run_dir, ignore_errors=True)
+    results.put(measurement)
+
+
+def start_server(context, profile: dict, hosts: int, port: int):
+    ready = context.Queue()
+    server = context.Process(target=serve, args=(profile, hosts, port, ready), daemon=True)
+    server.start()
+    return server, ready.get(timeout=30)
+
+
+def measure(context, case: dict, input_path: Path) -> dict:
+    results = context.Queue()
+    worker = context.Process(target=run_case, args=(case, str(input_path.resolve()), results))
+    worker.start()
+    while True:
+        try:
+            measurement = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not worker.is_alive():
+                raise RuntimeError(f"Benchmark run {case['engine']}/{case['config']} failed "
+                                   f"(exit code {worker.exitcode})")
+    worker.join()
+    return measurement
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                              text=True, timeout=10).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def print_results(results):
+    print(f"\n{'case':<48} {'urls':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'CPU s':>7}")
+    for result in results:
+        label = '/'.join(str(result[key]) for key in CASE_KEY)
+        print(f"{label:<48} {result['urls']:>8} {result['throughput_rps']:>9.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f} {result['peak_rss_mb'] or '-':>8} {result['cpu_s'] or '-':>7}")
+
+
+def compare(results, baseline_file: str):
+    """Print the change of every case that also appears in the baseline"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {tuple(r[key] for key in CASE_KEY): r for r in json.load(f)['results']}
+
+    print(f"\nCompared with {baseline_file}:")
+    for result in results:
+        key = tuple(result[k] for k in CASE_KEY)
+        old = baseline.get(key)
+        if old is None:
+            continue
+        changes = []
+        for metric in ('throughput_rps', 'p99_ms', 'peak_rss_mb', 'cpu_s'):
+            if old.get(metric) and result.get(metric) is not None:
+                changes.append(f"{metric} {(result[metric] - old[metric]) / old[metric] * 100:+.1f}%")
+        print(f"  {'/'.join(str(part) for part in key)}: {', '.join(changes)}")
+
+
+def main():
+    args = parse_args()
+    # A fresh interpreter per run keeps memory and CPU measurements independent
+    context = multiprocessing.get_context('spawn')
+    work_dir = Path(args.work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    profile = profile_settings(args.profile)
+    options = parse_options(args.option)
+
+    server, port = start_server(context, profile, args.hosts, args.port)
+    print(f"[INFO] Simulated server listening on port {port} ({args.hosts} host(s), profile {args.profile})")
+
+    results = []
+    try:
+        for scale in args.scale.split(','):
+            count = parse_scale(scale)
+            print(f"[INFO] Preparing {args.mode} input with {count} URLs...")
+            if args.mode == 'defined':
+                input_path = defined_list(work_dir, count, args.hosts, port)
+            else:
+                input_path = sitemap_list(work_dir, count, port, args.gzip)
+
+            for engine in args.engines.split(','):
+                for config_name in args.configs.split(','):
+                    case = {'mode': args.mode, 'scale': scale, 'profile': args.profile,
+                            'engine': engine, 'config': config_name,
+                            'options': dict(CONFIGS[config_name], **options)}
+                    print(f"[INFO] Running {engine}/{config_name} on {count} URLs...")
+                    case.update(measure(context, case, input_path))
+                    results.append(case)
+    finally:
+        server.terminate()
+
+    output = args.output or f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'version': git_version(),
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'hosts': args.hosts,
+                'server_profile': profile,
+            },
+            'results': results
+        }, f, indent=2)
+
+    print_results(results)
+    print(f"\n[OK] Results saved to: {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""Local HTTP server that simulates slow, failing and misbehaving websites"""
+
+import asyncio
+import gzip
+import random
+import socket
+import struct
+import zlib
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+except ImportError:  # Optional: without h2 the server only speaks HTTP/1.1
+    h2 = None
+
+
+REASONS = {200: 'OK', 301: 'Moved Permanently', 304: 'Not Modified', 404: 'Not Found',
+           429: 'Too Many Requests', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+HTTP2_PREFACE = b'PRI * HTTP/2.0\r\n\r\n'
+HTTP2_MAX_STREAMS = 128  # Concurrent streams the server allows per HTTP/2 connection
+
+# status, body, extra headers, content type, trickle ms (None = reset the connection)
+Answer = Optional[Tuple[int, bytes, Optional[Dict[str, str]], str, float]]
+
+
+@dataclass
+class ServerProfile:
+    """
+    Behavior of the simulated sites
+
+    Delays, statuses, redirects and slow bodies are derived from a hash of
+    the request path, so a given URL always behaves the same way and runs
+    are comparable. Resets are drawn per request, like real network errors.
+    """
+    latency_ms: float = 20  # Median response delay
+    latency_sigma: float = 0.5  # Log-normal spread of the delay (0 = always latency_ms)
+    status_mix: Dict[int, float] = field(default_factory=lambda: {200: 0.93, 404: 0.04, 500: 0.02, 503: 0.01})
+    redirect_ratio: float = 0.05  # Share of URLs answered with a 301 to the final page
+    slow_body_ratio: float = 0.01  # Share of URLs whose body trickles in over slow_body_ms
+    slow_body_ms: float = 1000
+    reset_ratio: float = 0.002  # Share of requests answered with a TCP reset
+    body_bytes: int = 4096
+    keep_alive: bool = True
+    keepalive_requests: int = 100  # Requests served per connection before closing it
+    keepalive_timeout: float = 5  # Seconds an idle connection is kept open
+    capacity: int = 0  # Concurrent requests per host served normally; more are answered 503 (0 = unlimited)
+
+    @classmethod
+    def from_dict(cls, values: dict) -> 'ServerProfile':
+        values = dict(values)
+        if 'status_mix' in values:
+            values['status_mix'] = {int(k): v for k, v in values['status_mix'].items()}
+        return cls(**values)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+PROFILES = {
+    'instant': ServerProfile(latency_ms=0, latency_sigma=0, status_mix={200: 1.0}, redirect_ratio=0,
+                             slow_body_ratio=0, reset_ratio=0, body_bytes=512),
+    'realistic': ServerProfile(),
+    'hostile': ServerProfile(latency_ms=80, latency_sigma=1.0,
+                             status_mix={200: 0.75, 404: 0.08, 429: 0.05, 500: 0.07, 503: 0.05},
+                             redirect_ratio=0.15, slow_body_ratio=0.05, slow_body_ms=3000,
+                             reset_ratio=0.02, keepalive_requests=10, keepalive_timeout=1),
+}
+
+
+class SimulatedServer:
+    """
+    asyncio HTTP/1.1 server for benchmarks, which also speaks cleartext
+    HTTP/2 to clients that open with the HTTP/2 preface (requires h2)
+
+    Paths:
+        /p/<n>                          a page, behaving as the profile decides
+        /sitemap/<start>-<count>.xml    sitemap listing pages start..start+count-1
+        /sitemap/<start>-<count>.xml.gz the same sitemap, gzip-compressed
+    """
+
+    def __init__(self, profile: ServerProfile, hosts: List[str], port: int = 0):
+        """
+        Args:
+            profile: Simulated behavior
+            hosts: Loopback addresses to listen on; sitemap URLs are spread over all of them
+            port: Port to listen on (0 = pick a free one)
+        """
+        self.profile = profile
+        self.hosts = hosts
+        self.port = port or free_port(hosts[0])
+        self._server = None
+        self._statuses = list(profile.status_mix)
+        self._in_flight: Dict[str, int] = {}
+        self._weights = list(profile.status_mix.values())
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, host=self.hosts, port=self.port,
+                                                  backlog=4096, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        served = 0
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                                  self.profile.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                if served == 0 and head == HTTP2_PREFACE and h2 is not None:
+                    await _Http2Connection(self, reader, writer).serve(head)
+                    return
+                served += 1
+                method, path = head.split(b' ', 2)[:2]
+                keep_alive = (self.profile.keep_alive and served < self.profile.keepalive_requests
+                              and b'connection: close' not in head.lower())
+                if not await self._respond(writer, method.decode(), path.decode(), keep_alive):
+                    return
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError):
+            return
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def _respond(self, writer: asyncio.StreamWriter, method: str, path: str, keep_alive: bool) -> bool:
+        """Answer one request; returns False if the connection was reset"""
+        answer = await self.answer(path, writer.get_extra_info('sockname')[0])
+        if answer is None:
+            sock = writer.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            writer.transport.abort()
+            return False
+        status, body, headers, content_type, trickle_ms = answer
+        await self._send(writer, method, status, body, keep_alive, content_type, headers, trickle_ms)
+        return True
+
+    async def answer(self, path: str, host: str) -> Answer:
+        """Decide the response to a request for `path` on `host` (None = reset the connection)"""
+        if path.startswith('/sitemap/'):
+            return 200, self._sitemap(path), None, 'application/xml', 0
+
+        profile = self.profile
+        if profile.capacity and self._in_flight.get(host, 0) >= profile.capacity:
+            return 503, b'overloaded', {'Retry-After': '1'}, 'text/html', 0
+
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        try:
+            return await self._answer_page(path)
+        finally:
+            self._in_flight[host] -= 1
+
+    async def _answer_page(self, path: str) -> Answer:
+        profile = self.profile
+        rng = random.Random(zlib.crc32(path.encode()))
+        if profile.latency_ms:
+            delay = profile.latency_ms
+            if profile.latency_sigma:
+                delay *= rng.lognormvariate(0, profile.latency_sigma)
+            await asyncio.sleep(delay / 1000)
+
+        # Resets are decided per attempt so retries can succeed
+        if profile.reset_ratio and random.random() < profile.reset_ratio:
+            return None
+
+        if '?' not in path and rng.random() < profile.redirect_ratio:
+            return 301, b'', {'Location': path + '?from=301'}, 'text/html', 0
+
+        status = rng.choices(self._statuses, self._weights)[0]
+        body = b'x' * profile.body_bytes
+        slow = rng.random() < profile.slow_body_ratio
+        return (status, body, {'Retry-After': '1'} if status == 429 else None, 'text/html',
+                profile.slow_body_ms if slow else 0)
+
+    async def _send(self, writer: asyncio.StreamWriter, method: str, status: int, body: bytes,
+                    keep_alive: bool, content_type: str = 'text/html',
+                    headers: Optional[Dict[str, str]] = None, trickle_ms: float = 0):
+        lines = [f'HTTP/1.1 {status} {REASONS.get(status, "Unknown")}',
+                 f'Content-Type: {content_type}',
+                 f'Content-Length: {len(body)}',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        if method == 'HEAD' or not body:
+            await writer.drain()
+            return
+
+        if trickle_ms:
+            chunks = 10
+            step = -(-len(body) // chunks)
+            for offset in range(0, len(body), step):
+                writer.write(body[offset:offset + step])
+                await writer.drain()
+                await asyncio.sleep(trickle_ms / chunks / 1000)
+            return
+
+        writer.write(body)
+        await writer.drain()
+
+    def _sitemap(self, path: str) -> bytes:
+        name = path.rsplit('/', 1)[1]
+        compressed = name.endswith('.gz')
+        start, count = (int(part) for part in name.split('.', 1)[0].split('-'))
+        base_host = self.hosts[0].rsplit('.', 1)[0]
+        first = int(self.hosts[0].rsplit('.', 1)[1])
+
+        parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n']
+        for n in range(start, start + count):
+            host = f'{base_host}.{first + n % len(self.hosts)}'
+            parts.append(f'<url><loc>http://{host}:{self.port}/p/{n}</loc></url>\n')
+        parts.append('</urlset>\n')
+        body = ''.join(parts).encode()
+        return gzip.compress(body, compresslevel=1) if compressed else body
+
+
+class _Http2Connection:
+    """One cleartext HTTP/2 connection of the simulated server; every stream is answered by its own task"""
+
+    def __init__(self, server: SimulatedServer, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.host = writer.get_extra_info('sockname')[0]
+        self.conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        self._window_updated = asyncio.Event()
+
+    async def serve(self, preface: bytes):
+        conn = self.conn
+        conn.initiate_connection()
+        conn.update_settings({h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: HTTP2_MAX_STREAMS})
+        streams = set()
+        data = preface
+        try:
+            while data:
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        headers = dict(event.headers)
+                        stream = asyncio.ensure_future(self._respond(event.stream_id, headers[':method'],
+                                                                     headers[':path']))
+                        streams.add(stream)
+                        stream.add_done_callback(streams.discard)
+                    elif isinstance(event, (h2.events.WindowUpdated, h2.events.StreamReset)):
+                        self._window_updated.set()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+                self._flush()
+                data = await asyncio.wait_for(self.reader.read(65536), self.server.profile.keepalive_timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError, h2.exceptions.ProtocolError):
+            pass
+        finally:
+            for stream in streams:
+                stream.cancel()
+            self.writer.close()
+
+    async def _respond(self, stream_id: int, method: str, path: str):
+        conn = self.conn
+        answer = await self.server.answer(path, self.host)
+        try:
+            if answer is None:
+                # A connection reset would fail every stream; reset just this one
+                conn.reset_stream(stream_id)
+                self._flush()
+                return
+            status, body, headers, content_type, trickle_ms = answer
+            if method == 'HEAD':
+                body = b''
+            response_headers = [(':status', str(status)), ('content-type', content_type),
+                                ('content-length', str(len(body)))]
+            response_headers += [(name.lower(), value) for name, value in (headers or {}).items()]
+            conn.send_headers(stream_id, response_headers, end_stream=not body)
+            self._flush()
+            if not body:
+                return
+
+            chunks = 10 if trickle_ms else 1
+            step = -(-len(body) // chunks)
+            for offset in range(0, len(body), step):
+                await self._send_data(stream_id, body[offset:offset + step], end_stream=offset + step >= len(body))
+                if trickle_ms:
+                    await asyncio.sleep(trickle_ms / chunks / 1000)
+        except (h2.exceptions.StreamClosedError, ConnectionError, OSError):
+            pass  # The client reset the stream or closed the connection
+
+    async def _send_data(self, stream_id: int, data: bytes, end_stream: bool):
+        """Send within the flow-control windows, waiting for WINDOW_UPDATE when they are full"""
+        conn = self.conn
+        while data:
+            size = min(conn.local_flow_control_window(stream_id), len(data), conn.max_outbound_frame_size)
+            if size <= 0:
+                self._window_updated.clear()
+                await self._window_updated.wait()
+                continue
+            conn.send_data(stream_id, data[:size])
+            data = data[size:]
+        if end_stream:
+            conn.end_stream(stream_id)
+        self._flush()
+
+    def _flush(self):
+        outgoing = self.conn.data_to_send()
+        if outgoing:
+            self.writer.write(outgoing)
+
+
+def free_port(host: str) -> int:
+    """A port that is currently free on `host` (the same port is then used on every address)"""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def loopback_hosts(count: int) -> List[str]:
+    """127.0.0.1, 127.0.0.2, ... (every 127.x address is loopback on Linux)"""
+    return [f'127.0.0.{i}' for i in range(1, count + 1)]
+
+
+def serve(profile: dict, hosts: int, port: int, ready):
+    """Process entry point: run the server until terminated, reporting the port through `ready`"""
+    server = SimulatedServer(ServerProfile.from_dict(profile), loopback_hosts(hosts), port)
+
+    async def main():
+        ready.put(await server.start())
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
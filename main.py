@@ -4,9 +4,22 @@ Entry point for the URL testing application.
 """
 
 import sys
+import argparse
 import logging
-from src.application import URLTestApplication
-from src.models import TestConfig
+import multiprocessing
+
+# The application modules (requests, aiohttp, openpyxl) are imported inside the
+# functions that run it, so --help and argument errors return immediately
+
+
+MODES = ("defined", "sitemap")
+REPORT_FORMATS = ("xlsx", "csv", "jsonl", "parquet")
+ENGINES = ("threaded", "asyncio", "http2")
+
+# Exit codes of headless runs: the number of failed URLs, capped below the error codes
+EXIT_MAX_FAILURES = 100
+EXIT_ERROR = 101  # The run could not complete (missing input, invalid settings, ...)
+EXIT_INTERRUPTED = 130  # Stopped with Ctrl+C / SIGINT
 
 
 # Set UTF-8 encoding for Windows console
@@ -17,28 +30,181 @@ if sys.platform == 'win32':
         pass
 
 
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(
+        description="Concurrent URL testing tool",
+        epilog=f"With --mode the run is headless: no prompts, and the exit code is the number "
+               f"of failed URLs (at most {EXIT_MAX_FAILURES}), {EXIT_ERROR} if the run could not "
+               f"complete, {EXIT_INTERRUPTED} if interrupted."
+    )
+    parser.add_argument(
+        "--mode", choices=MODES,
+        help="run without prompts (for cron and CI): test a defined URL list or sitemaps"
+    )
+    parser.add_argument(
+        "--input", metavar="PATH",
+        help="input file: .xlsx, .csv, .txt (one URL per line) or - for stdin "
+             "[default: urls_to_test.xlsx / sitemaps.xlsx]"
+    )
+    parser.add_argument(
+        "--root", metavar="URL", help="root URL for relative URLs (overrides the input's root column; needed for text input)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=50, help="concurrent requests [default: 50]"
+    )
+    parser.add_argument(
+        "--timeout", type=int, default=10000, metavar="MS", help="request timeout in ms [default: 10000]"
+    )
+    parser.add_argument(
+        "--delay", type=int, default=100, metavar="MS", help="delay between requests in ms [default: 100]"
+    )
+    parser.add_argument(
+        "--format", choices=REPORT_FORMATS, default="xlsx", help="report format [default: xlsx]"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="do not echo failed URLs while testing (progress is still shown)"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=0, metavar="PORT",
+        help="serve live metrics on http://127.0.0.1:PORT/metrics (Prometheus) and /metrics.json; "
+             "with --processes, worker N uses PORT+N"
+    )
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="threaded", help="request engine [default: threaded]"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue an interrupted run: skip URLs already in the journal and "
+             "include their results in the report"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="re-test only new URLs, URLs whose sitemap <lastmod> changed, URLs that failed last time "
+             "and a rolling sample of the rest (state kept in url_state.db)"
+    )
+    parser.add_argument(
+        "--incremental-sample", type=float, default=0.05, metavar="SHARE",
+        help="share of unchanged URLs re-tested per incremental run [default: 0.05]"
+    )
+    parser.add_argument(
+        "--shard", metavar="I/N", type=parse_shard,
+        help="test only shard I of N (hosts are split by hash), e.g. 2/4 on the second "
+             "of four machines; combine the partial results with --merge"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=1,
+        help="split the URLs across this many worker processes on this machine"
+    )
+    parser.add_argument(
+        "--merge", nargs="+", metavar="JOURNAL",
+        help="combine the partial result journals of a sharded run into a single report"
+    )
+    args = parser.parse_args()
+    if args.input == "-" and not args.mode:
+        parser.error("reading URLs from stdin (--input -) requires --mode, since the prompts also read stdin")
+    return args
+
+
+def parse_shard(value):
+    """Parse an 'I/N' shard argument into a 0-based (index, count) pair"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got '{value}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} is outside 1-{count}")
+    return index - 1, count
+
+
+def ask_mode():
+    """Prompt for the testing mode"""
+    print("\nSelect testing mode:")
+    print("  1. Defined URL list (from urls_to_test.xlsx)")
+    print("  2. Sitemap parsing (from sitemaps.xlsx)")
+    print()
+    
+    # Get user choice
+    while True:
+        choice = input("Enter your choice (1 or 2): ").strip()
+        if choice in ['1', '2']:
+            break
+        print("Invalid choice. Please enter 1 or 2.")
+    
+    # Set mode based on choice
+    return "defined" if choice == "1" else "sitemap"
+
+
+def build_config(args, max_workers: int, timeout_ms: int, delay_ms: int):
+    """TestConfig from the command line and the performance settings"""
+    from src.models import TestConfig
+    
+    shard_index, shard_count = args.shard or (0, 1)
+    return TestConfig(
+        max_workers=max_workers,
+        timeout=timeout_ms / 1000,  # Convert to seconds for requests library
+        delay=delay_ms / 1000,  # Convert to seconds
+        processes=max(args.processes, 1),
+        shard_index=shard_index,
+        shard_count=shard_count,
+        input_file=args.input or '',
+        input_root=args.root or '',
+        report_format=args.format,
+        engine=args.engine,
+        quiet=args.quiet,
+        metrics_port=args.metrics_port,
+        incremental=args.incremental,
+        incremental_sample=args.incremental_sample
+    )
+
+
+def run_headless(args) -> int:
+    """Run with the command-line settings only and return the exit code"""
+    from src.application import URLTestApplication
+    from src.sharding import merge_partials
+    
+    try:
+        if args.merge:
+            failures = len(merge_partials(args.merge, args.mode, args.format).failures)
+        else:
+            config = build_config(args, args.workers, args.timeout, args.delay)
+            failures = URLTestApplication(mode=args.mode, config=config, resume=args.resume).run()
+    except KeyboardInterrupt:
+        print("\n[INFO] Testing was interrupted")
+        return EXIT_INTERRUPTED
+    except (FileNotFoundError, ValueError) as e:
+        print(f"\nERROR: {str(e)}")  # Bad input or settings: no traceback needed
+        return EXIT_ERROR
+    except Exception as e:
+        print(f"\nERROR: {str(e)}")
+        logging.error(f"Application error: {str(e)}", exc_info=True)
+        return EXIT_ERROR
+    return min(failures, EXIT_MAX_FAILURES)
+
+
 def main():
     """Main entry point"""
+    args = parse_args()
+    if args.mode:
+        sys.exit(run_headless(args))
+    
+    from src.application import URLTestApplication
+    from src.sharding import merge_partials
     try:
         print("=" * 60)
         print("           URL TESTER APPLICATION")
         print("=" * 60)
         print("\n⚠️  Press Ctrl+C at any time to stop testing")
         print("=" * 60)
-        print("\nSelect testing mode:")
-        print("  1. Defined URL list (from urls_to_test.xlsx)")
-        print("  2. Sitemap parsing (from sitemaps.xlsx)")
-        print()
+        if args.resume:
+            print("\n[INFO] Resume mode: URLs already in the journal will be skipped")
         
-        # Get user choice
-        while True:
-            choice = input("Enter your choice (1 or 2): ").strip()
-            if choice in ['1', '2']:
-                break
-            print("Invalid choice. Please enter 1 or 2.")
+        mode = ask_mode()
         
-        # Set mode based on choice
-        mode = "defined" if choice == "1" else "sitemap"
+        if args.merge:
+            merge_partials(args.merge, mode, args.format)
+            input("\nPress Enter to exit...")
+            return
         
         print()
         print("=" * 60)
@@ -51,26 +217,20 @@ def main():
         # Get timeout in milliseconds
         timeout_input = input(f"  Request timeout in ms [default: 10000]: ").strip()
         timeout_ms = int(timeout_input) if timeout_input.isdigit() else 10000
-        timeout = timeout_ms / 1000  # Convert to seconds for requests library
         
         # Get delay in milliseconds
         delay_input = input(f"  Delay between requests in ms [default: 100]: ").strip()
         delay_ms = int(delay_input) if delay_input.isdigit() else 100
-        delay = delay_ms / 1000  # Convert to seconds for time.sleep()
         
         print()
         print(f"[INFO] Using: {max_workers} threads, {timeout_ms}ms timeout, {delay_ms}ms delay")
         print("=" * 60)
         
         # Create configuration
-        config = TestConfig(
-            max_workers=max_workers,
-            timeout=timeout,
-            delay=delay
-        )
+        config = build_config(args, max_workers, timeout_ms, delay_ms)
         
         # Create and run application
-        app = URLTestApplication(mode=mode, config=config)
+        app = URLTestApplication(mode=mode, config=config, resume=args.resume)
         app.run()
         
     except KeyboardInterrupt:
@@ -78,7 +238,7 @@ def main():
         print("⚠️  TESTING STOPPED BY USER (Ctrl+C)")
         print("=" * 60)
         print("\n[INFO] Testing was interrupted")
-        print("[INFO] Partial results may have been saved")
+        print("[INFO] Partial results were saved to the journal (use --resume to continue)")
         print("\nPress Enter to exit...")
         try:
             input()
@@ -96,5 +256,6 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Worker processes in the frozen executable
     main()
 
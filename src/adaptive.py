@@ -0,0 +1,113 @@
+"""AIMD per-host concurrency control driven by latency, timeouts and 429/503 answers"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .models import TestResult, TestConfig
+from .latency import LatencyHistogram
+
+
+BACKOFF_STATUSES = (429, 503, 'TIMEOUT')  # Outcomes that mean "the host is overloaded"
+MIN_ROUND_RESULTS = 5  # Latencies needed for a meaningful round p90, even at low limits
+
+
+class _HostState:
+    __slots__ = ('limit', 'window', 'best_p90', 'since_decrease')
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.window = LatencyHistogram()  # Latencies of the current round
+        self.best_p90: Optional[float] = None  # Lowest round p90 seen: the host's unloaded latency
+        self.since_decrease = float('inf')  # Results completed since the last decrease (none yet: back off at once)
+
+
+class AdaptiveConcurrency:
+    """
+    Additive-increase / multiplicative-decrease limit of concurrent checks per host
+
+    Every host starts at `initial`. After each round (as many healthy
+    results as the current limit, at least MIN_ROUND_RESULTS) the limit
+    grows by one, unless the round's p90 latency rose above
+    latency_factor times the best p90 seen for that host, which halves
+    it. A round at a limit of 1 measures the unloaded latency and resets
+    the baseline. A 429, 503 or timeout halves the limit at once; further
+    overload answers from checks that were already running are ignored
+    until another round has completed.
+    """
+
+    def __init__(self, initial: int = 2, maximum: int = 100, decrease: float = 0.5,
+                 latency_factor: float = 2.0):
+        """
+        Args:
+            initial: Concurrent checks a new host starts with
+            maximum: Upper bound per host
+            decrease: Factor applied to the limit on back-off
+            latency_factor: Round p90 / best p90 ratio that counts as rising latency
+        """
+        self.initial = max(min(initial, maximum), 1)
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self._hosts: Dict[str, _HostState] = {}
+        self._decisions: Dict[str, Tuple[int, int, str]] = {}  # Undisplayed (from, to, reason) per host
+
+    @classmethod
+    def from_config(cls, config: TestConfig) -> 'AdaptiveConcurrency':
+        return cls(
+            initial=config.adaptive_initial,
+            maximum=config.host_max_concurrent or config.max_workers,
+            latency_factor=config.adaptive_latency_factor
+        )
+
+    def limit(self, host: str) -> int:
+        """Current number of checks the host may have running"""
+        state = self._hosts.get(host)
+        return int(state.limit) if state is not None else self.initial
+
+    def observe(self, host: str, result: TestResult):
+        """Update the host's limit with a completed check"""
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial)
+        state.since_decrease += 1
+
+        if result.status_code in BACKOFF_STATUSES:
+            if state.since_decrease > state.limit:
+                self._decrease(host, state, f"{result.status_code}")
+            return
+
+        if result.timing is not None:
+            state.window.record(result.timing.total)
+        if state.window.count < max(state.limit, MIN_ROUND_RESULTS):
+            return
+
+        p90 = state.window.percentile(90)
+        state.window = LatencyHistogram()
+        if state.best_p90 is None or p90 < state.best_p90 or state.limit < 2:
+            state.best_p90 = p90
+        if p90 > state.best_p90 * self.latency_factor:
+            self._decrease(host, state, f"p90 {p90:.0f}ms vs {state.best_p90:.0f}ms")
+        elif state.limit < self.maximum:
+            old = int(state.limit)
+            state.limit = min(state.limit + 1, self.maximum)
+            self._record(host, old, int(state.limit), f"healthy, p90 {p90:.0f}ms")
+
+    def drain_decisions(self) -> List[str]:
+        """Limit changes since the last call, one line per host with the latest reason"""
+        # Swapped rather than cleared: the progress thread drains while checks keep completing
+        decisions, self._decisions = self._decisions, {}
+        return [f"{host}: {old} -> {new} ({reason})"
+                for host, (old, new, reason) in decisions.items() if old != new]
+
+    def limits(self) -> List[int]:
+        return [int(state.limit) for state in list(self._hosts.values())]  # Copy: hosts are added concurrently
+
+    def _decrease(self, host: str, state: _HostState, reason: str):
+        old = int(state.limit)
+        state.limit = max(state.limit * self.decrease, 1)
+        state.window = LatencyHistogram()
+        state.since_decrease = 0
+        self._record(host, old, int(state.limit), f"back-off: {reason}")
+
+    def _record(self, host: str, old: int, new: int, reason: str):
+        previous = self._decisions.get(host)
+        self._decisions[host] = (previous[0] if previous else old, new, reason)
@@ -1,62 +1,241 @@
 """Main application orchestrator"""
 
+from itertools import chain
+
 from .url_providers import URLProvider, DefinedListProvider, SitemapProvider
 from .url_tester import URLTesterService
 from .report_generator import ReportGenerator
+from .journal import ResultJournal
+from .http_cache import ConditionalCache
+from .incremental import IncrementalState, SKIPPED_HEADERS
 from .models import TestConfig
+from .latency import LATENCY_HEADERS
+from .sharding import filter_shard, journal_file_for, merge_partials, run_local_shards, shard_path
 
 
 class URLTestApplication:
     """Main application that orchestrates URL testing workflow"""
     
-    def __init__(self, mode: str, config: TestConfig = None):
+    def __init__(self, mode: str, config: TestConfig = None, resume: bool = False,
+                 journal_file: str = None, url_provider: URLProvider = None, merge_hint: bool = True):
         """
         Args:
             mode: 'defined' or 'sitemap'
             config: Test configuration (uses defaults if None)
+            resume: Skip URLs already recorded in the journal and report them with the new results
+            journal_file: Journal path (defaults to test_journal_<mode>.jsonl)
+            url_provider: Source of the URLs (defaults to the mode's input file)
+            merge_hint: Tell a shard to combine its results with --merge (off in worker processes,
+                whose results are merged automatically)
         """
         self.mode = mode
         self.config = config or TestConfig()
-        
+        self.resume = resume
+        self.merge_hint = merge_hint
+        if not 0 <= self.config.shard_index < self.config.shard_count:
+            raise ValueError(f"Invalid shard: {self.config.shard_index + 1} of {self.config.shard_count}")
         # Initialize components
-        self.url_provider = self._create_url_provider()
-        self.tester_service = URLTesterService(self.config)
-        self.report_generator = ReportGenerator(self.mode)
+        self.cache = self._create_cache()
+        self.incremental = self._create_incremental_state()
+        self.url_provider = url_provider or self._create_url_provider()
+        if journal_file is None:
+            journal_file = journal_file_for(mode)
+            if self.is_shard:
+                journal_file = shard_path(journal_file, self.config.shard_index, self.config.shard_count)
+        self.journal = ResultJournal(journal_file)
+        self.tester_service = URLTesterService(self.config, journal=self.journal, cache=self.cache,
+                                               incremental=self.incremental)
+        self.report_generator = ReportGenerator(self.mode, self.config.report_format)
     
+    @property
+    def is_shard(self) -> bool:
+        """Whether this run tests one shard and leaves its journal as a partial result"""
+        return self.config.shard_count > 1
+
     def _create_url_provider(self) -> URLProvider:
-        """Factory method to create appropriate URL provider"""
+        """Factory method to create appropriate URL provider (the input type follows the file extension)"""
         if self.mode == "defined":
-            return DefinedListProvider("urls_to_test.xlsx")
+            return DefinedListProvider(
+                self.config.input_file or "urls_to_test.xlsx",
+                root_url=self.config.input_root or None
+            )
         elif self.mode == "sitemap":
-            return SitemapProvider("sitemaps.xlsx")
+            return SitemapProvider(
+                self.config.input_file or "sitemaps.xlsx",
+                workers=self.config.sitemap_workers,
+                recursive=self.config.sitemap_recursive,
+                max_depth=self.config.sitemap_max_depth,
+                max_fetches=self.config.sitemap_max_fetches,
+                cache=self.cache,
+                skip_repeats=not self.config.dedupe
+            )
         else:
             raise ValueError(f"Invalid mode: {self.mode}. Must be 'defined' or 'sitemap'")
     
-    def run(self):
-        """Execute the complete URL testing workflow"""
+    def _create_cache(self):
+        """Open the conditional-request cache if one is configured"""
+        if not self.config.cache_path:
+            return None
+        # With worker processes this one only revalidates the sitemaps; the workers cache their pages per shard
+        return ConditionalCache(
+            self.config.cache_path,
+            max_entries=self.config.cache_max_entries,
+            max_age=self.config.cache_max_age
+        )
+    
+    def _create_incremental_state(self):
+        """Open the state of previous runs for an incremental run"""
+        if not self.config.incremental or self.config.processes > 1:
+            return None  # Worker processes open their own per-shard state
+        return IncrementalState.from_config(self.config, resume=self.resume)
+    
+    def _skipped_tables(self):
+        """Report table listing the URLs an incremental run skipped"""
+        if self.incremental is None or not self.incremental.skipped:
+            return []
+        return [('Skipped', SKIPPED_HEADERS, self.incremental.skipped_rows())]
+    
+    def _journal_skipped(self):
+        """Leave a shard's skipped URLs in its journal, for the Skipped table of the merged report"""
+        for _, _, rows in self._skipped_tables():
+            for row in rows:
+                self.journal.write_skipped(row)
+    
+    def _load_previous_run(self):
+        """Read the journal of an interrupted run when resuming"""
+        if not self.resume:
+            return None
+        if not self.journal.exists():
+            print(f"\n[WARNING] No journal found at {self.journal.file_path} - starting a new run")
+            return None
+        
+        previous = self.journal.load()
+        print(f"\n[OK] Resuming: {len(previous)} URLs already tested "
+              f"({len(previous.failures)} errors) according to {self.journal.file_path}")
+        return previous
+    
+    def _print_partial_hint(self, journal_files):
+        print(f"\n[OK] Partial results saved to: {', '.join(journal_files)}")
+        if self.merge_hint:
+            print("[INFO] Combine the partial results of all shards with --merge")
+    
+    def run(self) -> int:
+        """
+        Execute the complete URL testing workflow
+        
+        Returns:
+            Number of URLs that failed (including those from a resumed run)
+        """
         print("=" * 60)
         print("           URL TESTER APPLICATION")
         print("=" * 60)
         
+        if self.config.processes > 1:
+            # The URLs are read here and split by host across worker processes;
+            # each tests its shard and their journals are merged into one report
+            try:
+                journal_files = run_local_shards(self.mode, self.config, self.url_provider, self.resume)
+            finally:
+                if self.cache is not None:
+                    self.cache.close()
+            if self.is_shard:
+                self._print_partial_hint(journal_files)
+                return sum(len(ResultJournal(journal_file).load().failures) for journal_file in journal_files)
+            return len(merge_partials(journal_files, self.mode, self.config.report_format).failures)
+        
+        provided = None
+        failures = []
         try:
-            # Step 1: Get URLs from provider
-            url_requests = self.url_provider.get_urls()
-            
-            if not url_requests:
-                print("\n[WARNING] No URLs to test!")
-                return
+            # Step 1: Get URLs from provider (yielded lazily)
+            previous = self._load_previous_run()
+            provided = self.url_provider.get_urls()
+            url_iter = iter(provided)
+            filtered = False  # Only some of the provider's URLs are tested, so its total does not apply
+            if self.is_shard:
+                url_iter = filter_shard(url_iter, self.config.shard_index, self.config.shard_count)
+                filtered = True
+                print(f"\n[INFO] Testing shard {self.config.shard_index + 1} of {self.config.shard_count}")
+            if previous:
+                url_iter = previous.untested(url_iter)
+                filtered = True
+            if self.incremental is not None:
+                print(f"\n[INFO] Incremental run {self.incremental.run}: re-testing new, changed and "
+                      f"failing URLs and {self.config.incremental_sample:.0%} of the others "
+                      f"(state: {self.incremental.file_path})")
+                url_iter = self.incremental.select(url_iter)
+                filtered = True
+            first_request = next(url_iter, None)
+            # Providers learn their total once they have started reading
+            total = None if filtered else self.url_provider.total
             
-            # Step 2: Test all URLs
-            failed_results = self.tester_service.test_urls(url_requests)
+            if first_request is None:
+                if previous:
+                    failures = previous.failures
+                    print("\n[INFO] All URLs were already tested in the previous run")
+                    if self.is_shard:
+                        self.journal.open(append=True)
+                        self._journal_skipped()
+                        self.journal.close()
+                    else:
+                        self.report_generator.generate_report(previous.failures, tables=self._skipped_tables())
+                elif self.incremental is not None and self.incremental.skipped:
+                    print(f"\n[INFO] Nothing to re-test: {self.incremental.summary()}")
+                    if self.is_shard:
+                        self.journal.open()
+                        self._journal_skipped()
+                        self.journal.close()
+                    else:
+                        self.report_generator.generate_report([], tables=self._skipped_tables())
+                elif self.is_shard:
+                    # Leave an empty partial result so the merge sees every shard
+                    print("\n[INFO] No URLs belong to this shard")
+                    self.journal.open()
+                    self.journal.close()
+                else:
+                    print("\n[WARNING] No URLs to test!")
+                    return 0
+            else:
+                # Step 2: Test all URLs as the provider yields them, journaling each
+                # result and streaming failures into the report (Step 3).
+                # A shard only journals; the report is built when the shards are merged.
+                url_requests = chain([first_request], url_iter)
+                on_failure = None
+                if not self.is_shard:
+                    self.report_generator.open()
+                    for result in (previous.failures if previous else []):
+                        self.report_generator.add_result(result)
+                    on_failure = self.report_generator.add_result
+                self.journal.open(append=bool(previous))
+                try:
+                    failures = self.tester_service.test_urls(
+                        url_requests,
+                        total=total,
+                        previous=previous,
+                        on_failure=on_failure
+                    )
+                finally:
+                    if self.is_shard:
+                        self._journal_skipped()
+                    self.journal.close()
+                    if not self.is_shard:
+                        latency = self.tester_service.latency
+                        if len(latency):
+                            self.report_generator.add_table('Latency', LATENCY_HEADERS, latency.rows())
+                        for table in self._skipped_tables():
+                            self.report_generator.add_table(*table)
+                        self.report_generator.close()
             
-            # Step 3: Generate report
-            self.report_generator.generate_report(failed_results)
+            if self.is_shard:
+                self._print_partial_hint([str(self.journal.file_path)])
             
             print("\n" + "=" * 60)
             print("Testing completed successfully!")
             print("=" * 60)
+            return len(failures)
         
         except KeyboardInterrupt:
+            print(f"\n[INFO] Completed results are saved in {self.journal.file_path}")
+            print("[INFO] Run again with --resume to continue where testing stopped")
             # Re-raise to be handled by main.py
             raise
             
@@ -70,4 +249,15 @@ class URLTestApplication:
         except Exception as e:
             print(f"\nERROR: Unexpected error: {str(e)}")
             raise
+        finally:
+            # Stop background provider work before the cache it writes to is closed
+            if hasattr(provided, 'close'):
+                try:
+                    provided.close()
+                except ValueError:
+                    pass  # Still inside a blocked read on the engine's input thread, which ends with the process
+            if self.cache is not None:
+                self.cache.close()
+            if self.incremental is not None:
+                self.incremental.close()
 
@@ -0,0 +1,227 @@
+"""asyncio engine: non-blocking aiohttp checks on a single event loop (imported only when selected)"""
+
+import asyncio
+import socket
+import time
+from types import SimpleNamespace
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency, only needed for the asyncio engine
+    aiohttp = None
+
+from .models import URLTestRequest, TestResult, TestConfig, RequestTiming
+from .http_client import DEFAULT_HEADERS
+from .http_cache import ConditionalCache
+from .dns_cache import DNSCache
+from .retry import DelayedRequests, parse_retry_after
+from .scheduler import HostScheduler
+from .engines import CheckOutcome, ErrorCallback, ResultCallback, TestEngine, HEAD_FALLBACK_STATUSES, INPUT_WAIT
+
+
+class AsyncioEngine(TestEngine):
+    """Runs non-blocking aiohttp checks on a single event loop"""
+
+    def __init__(self, config: TestConfig, cache: Optional[ConditionalCache] = None):
+        if aiohttp is None:
+            raise ImportError("The asyncio engine requires aiohttp (pip install aiohttp)")
+        super().__init__(config, cache)
+
+    def run(self, url_requests: Iterable[URLTestRequest],
+            on_result: ResultCallback, on_error: ErrorCallback):
+        on_result, on_error = self._deduplicated(on_result, on_error)
+        asyncio.run(self._run(url_requests, on_result, on_error))
+
+    def _open_session(self):
+        """HTTP client shared by all checks of the run, used as an async context manager"""
+        connector_options = {}
+        if self.dns_cache is not None:
+            connector_options = {'resolver': _CachedResolver(self.dns_cache), 'use_dns_cache': False}
+        connector = aiohttp.TCPConnector(
+            limit=self.config.max_workers,
+            limit_per_host=self.config.pool_maxsize,
+            **connector_options
+        )
+        headers = dict(DEFAULT_HEADERS, **{'User-Agent': self.config.user_agent})
+
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+            auto_decompress=False,
+            trace_configs=[self._trace_config()]
+        )
+
+    async def _run(self, url_requests: Iterable[URLTestRequest],
+                   on_result: ResultCallback, on_error: ErrorCallback):
+        async with self._open_session() as session:
+
+            async def check(host: str, url_request: URLTestRequest):
+                try:
+                    return host, url_request, await self._test_single_url(session, url_request), None
+                except Exception as e:
+                    return host, url_request, None, e
+
+            scheduler = HostScheduler.from_config(self.config, self.concurrency, self.breaker)
+            delayed = DelayedRequests()
+            feed = self._feed(url_requests)
+            tasks = set()
+
+            print(f"[INFO] Streaming URLs to the event loop ({self.window_size} buffered)...")
+
+            try:
+                while True:
+                    self._requeue_due(scheduler, delayed)
+                    self._fill(scheduler, feed, len(tasks) + len(delayed), on_result)
+
+                    # The scheduler caps in-flight checks at max_workers
+                    while len(tasks) < self.config.max_workers:
+                        ready = scheduler.pop_ready()
+                        if ready is None:
+                            break
+                        if self._fail_fast(scheduler, *ready, on_result):
+                            continue
+                        tasks.add(asyncio.ensure_future(check(*ready)))
+                    self.in_flight = len(tasks)
+                    self.queued = len(scheduler) + len(delayed)
+
+                    if not tasks:
+                        if not len(scheduler) and not len(delayed):
+                            if feed.exhausted:
+                                break
+                            # Wait for the input off the loop (the executor thread gives up after INPUT_WAIT)
+                            await asyncio.get_running_loop().run_in_executor(None, feed.wait, INPUT_WAIT)
+                            continue
+                        await asyncio.sleep(self._wait_time(scheduler, delayed, feed))
+                        continue
+
+                    done, tasks = await asyncio.wait(
+                        tasks, timeout=self._wait_time(scheduler, delayed, feed),
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        host, url_request, result, error = task.result()
+                        scheduler.release(host, result)
+                        if error is not None:
+                            on_error(url_request, error)
+                        else:
+                            self._complete(url_request, result, delayed, on_result)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                feed.close()
+                self._close()
+
+    async def _test_single_url(self, session, url_request: URLTestRequest) -> TestResult:
+        """Test a single URL and return result"""
+        full_url = url_request.get_full_url()
+        timing = RequestTiming()
+        start = time.perf_counter()
+        outcome = await self._check(session, full_url, SimpleNamespace(timing=timing, start=start))
+        timing.total = (time.perf_counter() - start) * 1000
+        return self._result(url_request, full_url, outcome, timing)
+
+    async def _check(self, session, url: str, trace: SimpleNamespace) -> CheckOutcome:
+        try:
+            hostname = urlsplit(url).hostname
+            if self.dns_cache is not None and hostname:
+                start = time.perf_counter()
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.dns_cache.resolve, hostname)
+                finally:
+                    trace.timing.dns = (time.perf_counter() - start) * 1000
+            entry = self._cached_entry(url)
+            status_code, headers = await self._fetch(session, url, entry.conditional_headers() if entry else None,
+                                                     trace)
+            status_code = self._final_status(url, entry, status_code, headers)
+            return CheckOutcome(status_code, retry_after=parse_retry_after(headers.get('Retry-After')))
+
+        except socket.gaierror as e:
+            return CheckOutcome('DNS_ERROR', str(e))
+        except asyncio.TimeoutError:
+            return CheckOutcome('TIMEOUT', self._timeout_message())
+        except aiohttp.TooManyRedirects:
+            return CheckOutcome('TOO_MANY_REDIRECTS', 'Too many redirects')
+        except aiohttp.ClientConnectionError:
+            return CheckOutcome('CONNECTION_ERROR', 'Connection failed')
+        except Exception as e:
+            return CheckOutcome('ERROR', str(e))
+
+    async def _fetch(self, session, url: str, headers: Optional[dict] = None, trace: SimpleNamespace = None):
+        """Request the URL with the configured check method and return (status code, headers)"""
+        method = self.config.check_method
+        options = {'allow_redirects': True, 'max_redirects': 30, 'headers': headers,
+                   'trace_request_ctx': trace}
+
+        if method == 'head':
+            async with session.head(url, **options) as response:
+                if response.status not in HEAD_FALLBACK_STATUSES:
+                    return response.status, response.headers
+            method = 'stream'
+
+        async with session.get(url, **options) as response:
+            if method == 'stream':
+                body = b''
+                if self.config.max_body_bytes > 0:
+                    body = await response.content.read(self.config.max_body_bytes)
+                response.close()
+            else:
+                body = await response.read()
+            self.connection_stats.record_bytes(len(body))
+            return response.status, response.headers
+
+    def _trace_config(self):
+        """
+        Feed aiohttp connection events into the shared ConnectionStats and
+        the timing of each check (aiohttp reports the TLS handshake as part
+        of the connection, so it is counted under connect)
+        """
+        stats = self.connection_stats
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            stats.record_request()
+
+        async def on_request_end(session, context, params):
+            trace = context.trace_request_ctx
+            if trace is not None and not trace.timing.ttfb:
+                trace.timing.ttfb = (time.perf_counter() - trace.start) * 1000
+
+        async def on_connection_create_start(session, context, params):
+            context.connect_start = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params):
+            stats.record_new_connection()
+            trace = context.trace_request_ctx
+            if trace is not None:
+                trace.timing.connect += (time.perf_counter() - context.connect_start) * 1000
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+
+if aiohttp is not None:
+    class _CachedResolver(aiohttp.abc.AbstractResolver):
+        """aiohttp resolver backed by the engine's shared DNSCache"""
+
+        def __init__(self, dns_cache: DNSCache):
+            self.dns_cache = dns_cache
+
+        async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET):
+            addresses = await asyncio.get_running_loop().run_in_executor(
+                None, self.dns_cache.resolve_all, host
+            )
+            return [
+                {'hostname': host, 'host': address, 'port': port,
+                 'family': address_family, 'proto': 0, 'flags': socket.AI_NUMERICHOST}
+                for address_family, address in addresses
+                if family in (socket.AF_UNSPEC, address_family)
+            ]
+
+        async def close(self):
+            pass
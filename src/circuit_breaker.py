@@ -0,0 +1,119 @@
+"""Per-host circuit breaker: fail the URLs of a host that is down instead of waiting for each timeout"""
+
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from .models import TestResult, TestConfig
+
+
+BREAKER_STATUSES = ('TIMEOUT', 'CONNECTION_ERROR')  # Outcomes that count as "the host is down"
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class _HostCircuit:
+    __slots__ = ('state', 'failures', 'opened_at', 'last_error')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0  # Consecutive connection errors / timeouts
+        self.opened_at = 0.0
+        self.last_error = ''
+
+
+class CircuitBreaker:
+    """
+    Three-state circuit per host
+
+    closed:    checks run normally; `threshold` consecutive connection
+               errors or timeouts open the circuit
+    open:      the host's URLs are failed at once as HOST_DOWN; after
+               `cooldown` seconds the next URL is let through as a probe
+    half-open: the probe is running and the host's other URLs wait; any
+               HTTP response closes the circuit, another failure opens it
+               again for a further cooldown
+
+    All calls come from the engine's dispatch loop. State changes are
+    queued for the progress reporter (see drain_events).
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30):
+        """
+        Args:
+            threshold: Consecutive connection errors or timeouts that open a host's circuit
+            cooldown: Seconds an open circuit waits before probing the host again
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.opened = 0  # Times a circuit opened (including reopening after a failed probe)
+        self.recovered = 0  # Times a probe or late response closed an open circuit
+        self._hosts: Dict[str, _HostCircuit] = {}
+        self._events = deque()
+
+    @classmethod
+    def from_config(cls, config: TestConfig) -> 'CircuitBreaker':
+        return cls(threshold=config.breaker_threshold, cooldown=config.breaker_cooldown)
+
+    def allow(self, host: str) -> bool:
+        """
+        Whether a URL of the host may be checked now
+
+        Past the cooldown of an open circuit this lets one URL through as
+        the probe and moves the circuit to half-open.
+        """
+        circuit = self._hosts.get(host)
+        if circuit is None or circuit.state == CLOSED:
+            return True
+        if circuit.state == OPEN and time.monotonic() - circuit.opened_at >= self.cooldown:
+            circuit.state = HALF_OPEN
+            self._events.append(f"{host}: half-open, probing")
+            return True
+        return False
+
+    def probing(self, host: str) -> bool:
+        """Whether a probe of the host is running (its other URLs should wait)"""
+        circuit = self._hosts.get(host)
+        return circuit is not None and circuit.state == HALF_OPEN
+
+    def reason(self, host: str) -> str:
+        circuit = self._hosts[host]
+        return (f"Host down: not tested after {circuit.failures} consecutive failures "
+                f"(last: {circuit.last_error})")
+
+    def record(self, host: str, result: Optional[TestResult]):
+        """Update the host's circuit with a finished check (None if the check raised)"""
+        circuit = self._hosts.get(host)
+        if result is not None and result.status_code not in BREAKER_STATUSES:
+            if circuit is not None and circuit.state != CLOSED:
+                self.recovered += 1
+                self._events.append(f"{host}: closed, host answered {result.status_code}")
+            if circuit is not None:
+                circuit.state = CLOSED
+                circuit.failures = 0
+            return
+
+        if circuit is None:
+            circuit = self._hosts[host] = _HostCircuit()
+        if result is not None:
+            circuit.failures += 1
+            circuit.last_error = result.error_message or str(result.status_code)
+        if circuit.state == HALF_OPEN or (circuit.state == CLOSED and circuit.failures >= self.threshold):
+            self._open(host, circuit)
+
+    def drain_events(self) -> List[str]:
+        """State changes since the last call (safe to call from the progress thread)"""
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+    def _open(self, host: str, circuit: _HostCircuit):
+        reopened = circuit.state == HALF_OPEN
+        circuit.state = OPEN
+        circuit.opened_at = time.monotonic()
+        self.opened += 1
+        if reopened:
+            self._events.append(f"{host}: probe failed ({circuit.last_error}), open for another {self.cooldown:g}s")
+        else:
+            self._events.append(f"{host}: open after {circuit.failures} consecutive failures "
+                                f"({circuit.last_error}); failing its URLs as HOST_DOWN for {self.cooldown:g}s")
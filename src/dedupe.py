@@ -0,0 +1,271 @@
+"""Canonical URL forms and a memory-bounded index that tests each canonical URL once"""
+
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from hashlib import blake2b
+from typing import Callable, Dict, Iterable, List, Set
+from urllib.parse import urlsplit
+
+from .models import URLTestRequest, TestResult, TestConfig
+
+
+CANONICAL_RULES = {
+    'host': "lowercase scheme and host",
+    'port': "drop :80 from http and :443 from https URLs",
+    'dots': "resolve ./ and ../ path segments",
+    'fragment': "drop #fragments (never sent to the server)",
+    'query': "sort query parameters",
+    'slash': "drop the trailing slash of non-root paths",
+}
+DEFAULT_PORTS = {'http': ':80', 'https': ':443'}
+DEDUPE_INDEXES = ('digest', 'bloom')
+RECENT_CANONICALS = 100000  # Canonical URLs kept beside their digests to catch false duplicates
+UNTESTED_DUPLICATE = 'UNTESTED_DUPLICATE'  # Bloom filter hit that could not be confirmed
+# RFC 3986 appendix B, for absolute URLs: several times faster than urlsplit on URLs not seen before
+_URL_PARTS = re.compile(r'([^:/?#]+)://([^/?#]*)([^?#]*)(?:\?([^#]*))?(?:#(.*))?', re.DOTALL)
+
+
+def canonical_url(url: str, rules: Iterable[str] = ('host', 'port', 'dots', 'fragment', 'query')) -> str:
+    """
+    Normalized form of a URL; URLs with the same form get the same answer
+
+    Args:
+        url: Absolute URL
+        rules: Names from CANONICAL_RULES to apply
+    """
+    match = _URL_PARTS.fullmatch(url)
+    if match is not None:
+        scheme, netloc, path, query, fragment = match.groups(default='')
+    else:
+        scheme, netloc, path, query, fragment = urlsplit(url)
+    if 'host' in rules:
+        scheme = scheme.lower()
+        userinfo, at, hostport = netloc.rpartition('@')
+        netloc = userinfo + at + hostport.lower()
+    if 'port' in rules and scheme in DEFAULT_PORTS and netloc.endswith(DEFAULT_PORTS[scheme]):
+        netloc = netloc[:-len(DEFAULT_PORTS[scheme])]
+    if 'dots' in rules and '.' in path:
+        path = _remove_dot_segments(path)
+    if not path:
+        path = '/'  # http://host and http://host/ are the same request
+    elif 'slash' in rules and len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+    if 'query' in rules and '&' in query:
+        query = '&'.join(sorted(query.split('&')))
+    # Joined by hand: urlunsplit costs more than the rest of this function
+    canonical = f"{scheme}://{netloc}{path}?{query}" if query else f"{scheme}://{netloc}{path}"
+    if fragment and 'fragment' not in rules:
+        canonical += '#' + fragment
+    return canonical
+
+
+def _remove_dot_segments(path: str) -> str:
+    """RFC 3986 section 5.2.4, for absolute paths"""
+    output = []
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if path.endswith(('/.', '/..')):
+        output.append('')
+    return '/'.join(output) or '/'
+
+
+def url_digest(url: str) -> int:
+    """64-bit digest of a URL: collisions are not expected below billions of URLs"""
+    return int.from_bytes(blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class DigestSet:
+    """Set of 64-bit URL digests: exact in practice, a fraction of the memory of the URL strings"""
+
+    exact = True  # A hit means the URL was seen (a 64-bit collision is not expected)
+
+    def __init__(self):
+        self._digests = set()
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, digest: int) -> bool:
+        """Record a digest; False if it was already present"""
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+        return True
+
+
+class BloomFilter:
+    """
+    Fixed-size set of digests that may report a new digest as present
+
+    Sized for `capacity` entries at `error_rate` false positives, it never
+    grows. A false positive makes a unique URL count as a duplicate, so
+    the Deduplicator has to confirm a hit before trusting it.
+    """
+
+    exact = False
+
+    def __init__(self, capacity: int = 10000000, error_rate: float = 0.001):
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 64)  # Bits
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, digest: int) -> bool:
+        """Record a digest; False if it (probably) was already present"""
+        # Double hashing: the two halves of the digest generate every probe position
+        h1, h2 = digest & 0xffffffff, (digest >> 32) | 1
+        bits = self._bits
+        new = False
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        self._count += new
+        return new
+
+
+class Deduplicator:
+    """
+    Lets each canonical URL through once and answers its duplicates from that check
+
+    A duplicate of a URL that is still being checked waits for its
+    result. A duplicate of a failed URL gets a copy of the failure. If
+    the check raised instead of returning a result, the next duplicate
+    is checked itself. A duplicate of anything else gets a 200, because
+    successful results are not kept. Each copy keeps its own source and tested URL and names
+    the URL that was actually checked in duplicate_of (the canonical form
+    for copies of a success), so every input row still appears in the
+    journal and, if it failed, in the report.
+
+    The last RECENT_CANONICALS admitted canonical URLs are kept beside
+    their digests. A hit whose canonical URL differs is a false duplicate
+    (a Bloom false positive or a digest collision) and is checked after
+    all. A Bloom hit that can no longer be confirmed is reported as
+    UNTESTED_DUPLICATE rather than as a success nobody verified.
+    """
+
+    def __init__(self, rules: Iterable[str], index):
+        """
+        Args:
+            rules: Canonicalization rules (see CANONICAL_RULES)
+            index: DigestSet or BloomFilter of the canonical URLs admitted so far
+        """
+        unknown = set(rules) - set(CANONICAL_RULES)
+        if unknown:
+            raise ValueError(f"Unknown canonicalization rules: {', '.join(sorted(unknown))}. "
+                             f"Must be among: {', '.join(CANONICAL_RULES)}")
+        self.rules = frozenset(rules)
+        self.index = index
+        self.duplicates = 0
+        self._digests_by_url: Dict[str, int] = {}  # Tested URL -> digest, for checks in progress
+        self._waiting: Dict[int, List[URLTestRequest]] = {}  # Digest of a check in progress -> its duplicates
+        self._failures: Dict[int, TestResult] = {}
+        self._raised: Set[int] = set()  # Digests whose check raised, so no result can be copied
+        self._recent: OrderedDict = OrderedDict()  # Digest -> canonical URL, oldest admitted first
+        self._forgotten = False  # Whether _recent has dropped any digest yet
+
+    @classmethod
+    def from_config(cls, config: TestConfig) -> 'Deduplicator':
+        if config.dedupe_index not in DEDUPE_INDEXES:
+            raise ValueError(f"Invalid dedupe index: {config.dedupe_index}. "
+                             f"Must be one of: {', '.join(DEDUPE_INDEXES)}")
+        if config.dedupe_index == 'bloom':
+            index = BloomFilter(config.bloom_capacity, config.bloom_error_rate)
+        else:
+            index = DigestSet()
+        return cls(config.dedupe_rules, index)
+
+    @property
+    def unique(self) -> int:
+        return len(self.index)
+
+    def admit(self, url_request: URLTestRequest, on_result: Callable[[TestResult], None]) -> bool:
+        """
+        Whether the URL needs a check of its own
+
+        Duplicates are answered through on_result (now, or when the
+        check they depend on finishes) and must not be checked.
+        """
+        full_url = url_request.get_full_url()
+        canonical = canonical_url(full_url, self.rules)
+        digest = url_digest(canonical)
+        if self.index.add(digest) or digest in self._raised:
+            return self._track(full_url, digest, canonical)
+
+        known = self._recent.get(digest)
+        failure = self._failures.get(digest)
+        if known is None and failure is not None:
+            known = canonical_url(failure.tested_url, self.rules)
+        if known is None:
+            if not self._forgotten:
+                # No admitted URL has this digest: a Bloom false positive, so a new URL after all
+                return self._track(full_url, digest, canonical)
+            if not self.index.exact:
+                self.duplicates += 1
+                on_result(TestResult(url_request.url, full_url, UNTESTED_DUPLICATE,
+                                     "Probable duplicate (Bloom filter) too old to confirm; not checked",
+                                     time.time(), duplicate_of=canonical))
+                return False
+        elif known != canonical:
+            return True  # Digest collision: checked, but not tracked, as the digest belongs to another URL
+
+        self.duplicates += 1
+        waiting = self._waiting.get(digest)
+        if waiting is not None:
+            waiting.append(url_request)
+            return False
+        if failure is not None:
+            on_result(self._copy(url_request, failure))
+        else:
+            on_result(TestResult(url_request.url, full_url, 200, '', time.time(), duplicate_of=canonical))
+        return False
+
+    def _track(self, full_url: str, digest: int, canonical: str) -> bool:
+        """Admit a URL: its duplicates wait for its check"""
+        self._raised.discard(digest)
+        self._digests_by_url[full_url] = digest
+        self._waiting[digest] = []
+        self._recent[digest] = canonical
+        if len(self._recent) > RECENT_CANONICALS:
+            self._recent.popitem(last=False)
+            self._forgotten = True
+        return True
+
+    def finished(self, result: TestResult, on_result: Callable[[TestResult], None]):
+        """Answer the duplicates that waited for a finished check"""
+        if result.duplicate_of is not None:
+            return
+        digest = self._digests_by_url.pop(result.tested_url, None)
+        if digest is None:
+            return
+        if not result.is_success:
+            self._failures[digest] = result
+        for url_request in self._waiting.pop(digest, ()):
+            on_result(self._copy(url_request, result))
+
+    def failed(self, url_request: URLTestRequest, error: Exception,
+               on_error: Callable[[URLTestRequest, Exception], None]):
+        """Pass a check's exception on to the duplicates that waited for it (later ones are checked)"""
+        digest = self._digests_by_url.pop(url_request.get_full_url(), None)
+        if digest is None:
+            return
+        self._raised.add(digest)
+        for duplicate in self._waiting.pop(digest, ()):
+            on_error(duplicate, error)
+
+    @staticmethod
+    def _copy(url_request: URLTestRequest, result: TestResult) -> TestResult:
+        return replace(result, source_url=url_request.url, tested_url=url_request.get_full_url(),
+                       timing=None, duplicate_of=result.tested_url)
@@ -0,0 +1,143 @@
+"""In-process DNS resolution cache with negative caching and pre-resolution"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class _Entry:
+    __slots__ = ('addresses', 'error', 'expires')
+
+    def __init__(self, addresses: List[Tuple[int, str]], error: Optional[str], expires: float):
+        self.addresses = addresses
+        self.error = error
+        self.expires = expires
+
+
+class DNSCache:
+    """
+    Thread-safe hostname cache shared by all workers
+
+    Successful lookups are kept for `ttl` seconds and failures for
+    `negative_ttl` seconds. Concurrent misses for the same host wait for a
+    single lookup instead of all hitting the system resolver.
+    """
+
+    def __init__(self, ttl: float = 300, negative_ttl: float = 60, prefetch_workers: int = 8):
+        """
+        Args:
+            ttl: Seconds a resolved address is reused
+            negative_ttl: Seconds a failed lookup is remembered
+            prefetch_workers: Threads used to pre-resolve hosts in the background
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefetch_workers = prefetch_workers
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._prefetching: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def resolve(self, hostname: str) -> str:
+        """
+        Return the first address for a hostname
+
+        Raises:
+            socket.gaierror: If the host could not be resolved (possibly cached)
+        """
+        return self.resolve_all(hostname)[0][1]
+
+    def resolve_all(self, hostname: str) -> List[Tuple[int, str]]:
+        """
+        Return every (family, address) pair for a hostname
+
+        Raises:
+            socket.gaierror: If the host could not be resolved (possibly cached)
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(hostname)
+                if entry is not None and entry.expires > time.monotonic():
+                    break
+                event = self._inflight.get(hostname)
+                if event is None:
+                    event = self._inflight[hostname] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if not owner:
+                event.wait()
+                continue
+
+            try:
+                entry = self._lookup(hostname)
+                with self._lock:
+                    self._entries[hostname] = entry
+            finally:
+                with self._lock:
+                    del self._inflight[hostname]
+                event.set()
+            break
+
+        if entry.error is not None:
+            raise socket.gaierror(entry.error)
+        return entry.addresses
+
+    def failure(self, hostname: str) -> Optional[str]:
+        """Return the cached resolution error for a host, if it is known to be unresolvable"""
+        entry = self._entries.get(hostname)
+        if entry is not None and entry.error is not None and entry.expires > time.monotonic():
+            return entry.error
+        return None
+
+    def prefetch(self, hostname: str):
+        """Resolve a host in the background so workers find it cached"""
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if hostname in self._prefetching or (entry is not None and entry.expires > time.monotonic()):
+                return
+            self._prefetching.add(hostname)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.prefetch_workers,
+                                                thread_name_prefix='dns-prefetch')
+        self._executor.submit(self._prefetch, hostname)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def resolved_count(self) -> int:
+        return sum(1 for entry in list(self._entries.values()) if entry.error is None)
+
+    @property
+    def failed_count(self) -> int:
+        return sum(1 for entry in list(self._entries.values()) if entry.error is not None)
+
+    def _prefetch(self, hostname: str):
+        try:
+            self.resolve_all(hostname)
+        except socket.gaierror:
+            pass  # Remembered as a negative entry
+        finally:
+            with self._lock:
+                self._prefetching.discard(hostname)
+
+    def _lookup(self, hostname: str) -> _Entry:
+        now = time.monotonic()
+        try:
+            infos = socket.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError) as e:
+            return _Entry([], f"Could not resolve host {hostname}: {e}", now + self.negative_ttl)
+
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            address = (family, sockaddr[0])
+            if address not in addresses:
+                addresses.append(address)
+        return _Entry(addresses, None, now + self.ttl)
@@ -0,0 +1,404 @@
+"""Execution engines that run URL checks concurrently"""
+
+import socket
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import replace
+from typing import Callable, Iterable, NamedTuple, Optional
+from urllib.parse import urlsplit
+import requests
+
+from .models import URLTestRequest, TestResult, TestConfig, RequestTiming, intern_status
+from .http_client import ConnectionHooks, ConnectionStats, create_session
+from .http_cache import CacheEntry, ConditionalCache
+from .dns_cache import DNSCache
+from .adaptive import AdaptiveConcurrency
+from .circuit_breaker import CircuitBreaker
+from .dedupe import Deduplicator
+from .input_feed import InputFeed, INPUT_POLL
+from .retry import DelayedRequests, RetryPolicy, parse_retry_after
+from .scheduler import HostScheduler
+
+
+CHECK_METHODS = ('get', 'head', 'stream')
+HEAD_FALLBACK_STATUSES = (405, 501)  # Servers that refuse HEAD are retried with GET
+INPUT_WAIT = 0.5  # Longest block on an empty input, so Ctrl+C and shutdown stay responsive
+
+ResultCallback = Callable[[TestResult], None]
+ErrorCallback = Callable[[URLTestRequest, Exception], None]
+
+
+class CheckOutcome(NamedTuple):
+    """What a single check found, before it becomes a TestResult"""
+    status_code: object
+    error_message: Optional[str] = None  # None for an HTTP response (derived from the status)
+    retry_after: Optional[float] = None
+
+
+def make_result(url_request: URLTestRequest, tested_url: str, status_code, error_message: str,
+                timing: Optional[RequestTiming] = None, retry_after: Optional[float] = None) -> TestResult:
+    """Build a TestResult stamped with the current time"""
+    return TestResult(
+        source_url=url_request.url,
+        tested_url=tested_url,
+        status_code=intern_status(status_code),
+        error_message=error_message,
+        tested_at=time.time(),
+        timing=timing,
+        attempts=url_request.attempt,
+        retry_after=retry_after
+    )
+
+
+class TestEngine(ABC):
+    """Abstract base class for URL test execution engines"""
+
+    def __init__(self, config: TestConfig, cache: Optional[ConditionalCache] = None):
+        self.config = config
+        self.cache = cache
+        self.connection_stats = ConnectionStats()
+        self.dns_cache = DNSCache(config.dns_ttl, config.dns_negative_ttl) if config.dns_cache else None
+        self.concurrency = AdaptiveConcurrency.from_config(config) if config.adaptive_concurrency else None
+        self.retry = RetryPolicy.from_config(config) if config.max_retries > 0 else None
+        self.breaker = CircuitBreaker.from_config(config) if config.breaker_threshold > 0 else None
+        self.dedupe = Deduplicator.from_config(config) if config.dedupe else None
+        # Snapshots for the progress reporter, written only by the dispatch loop
+        self.in_flight = 0  # Checks running
+        self.queued = 0  # URLs buffered per host or waiting for a retry
+
+    @abstractmethod
+    def run(self, url_requests: Iterable[URLTestRequest],
+            on_result: ResultCallback, on_error: ErrorCallback):
+        """
+        Test all URLs, reporting each outcome as soon as it is available
+
+        URLs are read from the iterable on a background thread (see
+        InputFeed) and taken only while fewer than window_size are
+        buffered or running, so memory depends on concurrency rather than
+        on the number of URLs, and a slow input never holds up checks. Buffered URLs are
+        handed out by a HostScheduler, which interleaves hosts and applies
+        the per-host rate and concurrency limits. Retries wait in a
+        DelayedRequests queue and rejoin the scheduler when they are due.
+        URLs whose canonical form was already admitted are not checked
+        again; they get a copy of its result (see Deduplicator).
+
+        Args:
+            url_requests: URLs to test (may be a lazy generator)
+            on_result: Called from the caller's thread with every TestResult
+            on_error: Called when a check raised instead of returning a result
+        """
+        pass
+
+    @property
+    def window_size(self) -> int:
+        """Maximum number of URLs buffered or running at once"""
+        return self.config.max_in_flight or self.config.max_workers * 10
+
+    def _deduplicated(self, on_result: ResultCallback, on_error: ErrorCallback):
+        """Callbacks that also answer the duplicates waiting for each finished check"""
+        dedupe = self.dedupe
+        if dedupe is None:
+            return on_result, on_error
+
+        def result_callback(result: TestResult):
+            on_result(result)
+            dedupe.finished(result, on_result)
+
+        def error_callback(url_request: URLTestRequest, error: Exception):
+            on_error(url_request, error)
+            dedupe.failed(url_request, error, on_error)
+
+        return result_callback, error_callback
+
+    def _feed(self, url_requests: Iterable[URLTestRequest]) -> InputFeed:
+        """Start reading the input ahead of the dispatch loop"""
+        feed = InputFeed(url_requests, self.config.max_workers)
+        feed.start()
+        return feed
+
+    def _fill(self, scheduler: HostScheduler, feed: InputFeed, running: int,
+              on_result: ResultCallback):
+        """
+        Top up the scheduler buffer with the URLs the input feed has read
+
+        Duplicates are answered without being buffered. Each new host is
+        resolved in the background while its URLs wait in the buffer. URLs
+        of a host already known to be unresolvable are failed immediately
+        instead of being buffered. Answered URLs do not take buffer room,
+        so a run of them cannot leave the buffer empty (which would end
+        the run early).
+        """
+        room = self.window_size - len(scheduler) - running
+        while room > 0:
+            url_request = feed.get()
+            if url_request is None:
+                break
+            if self.dedupe is not None and not self.dedupe.admit(url_request, on_result):
+                continue
+            if self.dns_cache is not None:
+                hostname = urlsplit(url_request.get_full_url()).hostname
+                if hostname:
+                    error = self.dns_cache.failure(hostname)
+                    if error is not None:
+                        on_result(make_result(url_request, url_request.get_full_url(), 'DNS_ERROR', error))
+                        continue
+                    self.dns_cache.prefetch(hostname)
+            scheduler.add(url_request)
+            room -= 1
+
+    def _requeue_due(self, scheduler: HostScheduler, delayed: DelayedRequests):
+        """Move retries whose delay has passed back into the scheduler"""
+        for url_request in delayed.pop_due():
+            scheduler.add(url_request)
+
+    def _complete(self, url_request: URLTestRequest, result: TestResult,
+                  delayed: DelayedRequests, on_result: ResultCallback):
+        """Report a result, or schedule another attempt for a transient failure"""
+        if self.retry is not None:
+            delay = self.retry.retry_delay(url_request, result, result.retry_after)
+            if delay is not None:
+                delayed.push(replace(url_request, attempt=url_request.attempt + 1), delay)
+                return
+        on_result(result)
+
+    @staticmethod
+    def _wait_time(scheduler: HostScheduler, delayed: DelayedRequests, feed: InputFeed) -> Optional[float]:
+        """
+        Seconds until a throttled host or a delayed retry can be served, or
+        until the input is looked at again when it had no URL ready (None = none of these)
+        """
+        waits = [wait for wait in (scheduler.wait_time(), delayed.wait_time()) if wait is not None]
+        if feed.starved:
+            waits.append(INPUT_POLL)
+        return min(waits) if waits else None
+
+    def _fail_fast(self, scheduler: HostScheduler, host: str,
+                   url_request: URLTestRequest, on_result: ResultCallback) -> bool:
+        """
+        Fail a dispatched URL and everything buffered for its host if the host is
+        known to be unusable: it did not resolve (DNS_ERROR) or its circuit is open (HOST_DOWN)
+
+        Returns:
+            True if the URL was handled here and must not be checked
+        """
+        status_code, error = None, None
+        if self.dns_cache is not None:
+            hostname = urlsplit(url_request.get_full_url()).hostname
+            error = self.dns_cache.failure(hostname) if hostname else None
+            status_code = 'DNS_ERROR'
+        if error is None and self.breaker is not None and not self.breaker.allow(host):
+            status_code, error = 'HOST_DOWN', self.breaker.reason(host)
+        if error is None:
+            return False
+
+        scheduler.release(host)
+        for dropped in [url_request] + scheduler.drop(host):
+            on_result(make_result(dropped, dropped.get_full_url(), status_code, error))
+        return True
+
+    def _close(self):
+        if self.dns_cache is not None:
+            self.dns_cache.close()
+
+    def _result(self, url_request: URLTestRequest, tested_url: str, outcome: CheckOutcome,
+                timing: RequestTiming) -> TestResult:
+        """Build the result of a finished check, flagging 200 responses over the slow threshold"""
+        status_code, error_message, retry_after = outcome
+        if error_message is None:
+            error_message = '' if status_code == 200 else f'HTTP {status_code}'
+            threshold = self.config.slow_threshold_ms
+            if status_code == 200 and threshold and timing.total > threshold:
+                status_code = 'SLOW'
+                error_message = f'HTTP 200 in {timing.total:.0f}ms (slow, >{threshold:.0f}ms)'
+        return make_result(url_request, tested_url, status_code, error_message, timing, retry_after)
+
+    def _timeout_message(self) -> str:
+        return f'Request timed out (>{int(self.config.timeout * 1000)}ms)'
+
+    def _cached_entry(self, url: str) -> Optional[CacheEntry]:
+        return self.cache.lookup(url) if self.cache is not None else None
+
+    def _final_status(self, url: str, entry: Optional[CacheEntry], status_code: int, headers) -> int:
+        """Map a 304 back to the cached outcome and remember fresh validators"""
+        if self.cache is None:
+            return status_code
+        if status_code == 304 and entry is not None:
+            self.cache.revalidated(entry)
+            return entry.status_code
+        self.cache.store(url, status_code, headers)
+        return status_code
+
+
+class ThreadedEngine(TestEngine):
+    """Runs blocking requests checks on a thread pool"""
+
+    def __init__(self, config: TestConfig, cache: Optional[ConditionalCache] = None):
+        super().__init__(config, cache)
+        self.session = None
+        self.hooks = ConnectionHooks(self.connection_stats, self.dns_cache)
+
+    def run(self, url_requests: Iterable[URLTestRequest],
+            on_result: ResultCallback, on_error: ErrorCallback):
+        on_result, on_error = self._deduplicated(on_result, on_error)
+        self.session = create_session(self.config, self.hooks)
+        adapter = self.session.get_adapter('http://')
+        scheduler = HostScheduler.from_config(self.config, self.concurrency, self.breaker)
+        delayed = DelayedRequests()
+        feed = self._feed(url_requests)
+
+        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
+            futures = {}
+
+            print(f"[INFO] Streaming URLs to thread pool ({self.window_size} buffered)...")
+
+            # Keep every worker busy on a host that is within its limits
+            try:
+                while True:
+                    self._requeue_due(scheduler, delayed)
+                    self._fill(scheduler, feed, len(futures) + len(delayed), on_result)
+                    adapter.reserve_pools(scheduler.hosts)
+
+                    while len(futures) < self.config.max_workers:
+                        ready = scheduler.pop_ready()
+                        if ready is None:
+                            break
+                        host, url_request = ready
+                        if self._fail_fast(scheduler, host, url_request, on_result):
+                            continue
+                        future = executor.submit(self._test_single_url, url_request)
+                        futures[future] = (host, url_request)
+                    self.in_flight = len(futures)
+                    self.queued = len(scheduler) + len(delayed)
+
+                    if not futures:
+                        if not len(scheduler) and not len(delayed):
+                            if feed.exhausted:
+                                break
+                            feed.wait(INPUT_WAIT)  # Nothing to do until the input yields more URLs
+                            continue
+                        # Every buffered host is waiting for its next token, or only retries are left
+                        time.sleep(self._wait_time(scheduler, delayed, feed))
+                        continue
+
+                    done, _ = wait(futures, timeout=self._wait_time(scheduler, delayed, feed),
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        host, url_request = futures.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            scheduler.release(host)
+                            on_error(url_request, e)
+                            continue
+                        scheduler.release(host, result)
+                        self._complete(url_request, result, delayed, on_result)
+            except KeyboardInterrupt:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            finally:
+                feed.close()
+                self.session.close()
+                self._close()
+
+    def _test_single_url(self, url_request: URLTestRequest) -> TestResult:
+        """Test a single URL and return result"""
+        full_url = url_request.get_full_url()
+        timing = RequestTiming()
+        start = time.perf_counter()
+
+        # Connections opened on this thread add their phases to `timing`
+        self.hooks.begin(timing)
+        try:
+            outcome = self._check(full_url, timing)
+        finally:
+            self.hooks.end()
+        timing.total = (time.perf_counter() - start) * 1000
+        return self._result(url_request, full_url, outcome, timing)
+
+    def _check(self, url: str, timing: RequestTiming) -> CheckOutcome:
+        try:
+            self._resolve(url, timing)
+            entry = self._cached_entry(url)
+            response = self._fetch(url, entry.conditional_headers() if entry else None)
+            status_code = self._final_status(url, entry, response.status_code, response.headers)
+            return CheckOutcome(status_code, retry_after=parse_retry_after(response.headers.get('Retry-After')))
+
+        except socket.gaierror as e:
+            return CheckOutcome('DNS_ERROR', str(e))
+        except requests.exceptions.Timeout:
+            return CheckOutcome('TIMEOUT', self._timeout_message())
+        except requests.exceptions.ConnectionError:
+            return CheckOutcome('CONNECTION_ERROR', 'Connection failed')
+        except requests.exceptions.TooManyRedirects:
+            return CheckOutcome('TOO_MANY_REDIRECTS', 'Too many redirects')
+        except Exception as e:
+            return CheckOutcome('ERROR', str(e))
+
+    def _resolve(self, url: str, timing: RequestTiming):
+        """Resolve the host through the DNS cache so lookup failures get their own status"""
+        hostname = urlsplit(url).hostname
+        if self.dns_cache is not None and hostname:
+            start = time.perf_counter()
+            try:
+                self.dns_cache.resolve(hostname)
+            finally:
+                timing.dns = (time.perf_counter() - start) * 1000
+
+    def _fetch(self, url: str, headers: Optional[dict] = None) -> requests.Response:
+        """Request the URL with the configured check method, counting body bytes read"""
+        method = self.config.check_method
+        options = {'timeout': self.config.timeout, 'allow_redirects': True, 'headers': headers}
+
+        if method == 'head':
+            response = self.session.head(url, **options)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                return response
+            method = 'stream'
+
+        if method == 'stream':
+            # Closing an unread streamed response drops the connection instead of downloading the body
+            with self.session.get(url, stream=True, **options) as response:
+                if self.config.max_body_bytes > 0:
+                    next(response.iter_content(self.config.max_body_bytes), None)
+                self._count_bytes(response)
+            return response
+
+        response = self.session.get(url, **options)
+        self._count_bytes(response)
+        return response
+
+    def _count_bytes(self, response: requests.Response):
+        for hop in response.history + [response]:
+            self.connection_stats.record_bytes(hop.raw.tell())
+
+
+def _asyncio_engine():
+    # Imported on demand: aiohttp takes longer to import than the rest of the tester
+    from .async_engine import AsyncioEngine
+    return AsyncioEngine
+
+
+def _http2_engine():
+    # Imported on demand, like the asyncio engine
+    from .http2_engine import Http2Engine
+    return Http2Engine
+
+
+# Engine name -> loader returning the engine class
+ENGINES = {
+    'threaded': lambda: ThreadedEngine,
+    'asyncio': _asyncio_engine,
+    'http2': _http2_engine
+}
+
+
+def create_engine(config: TestConfig, cache: Optional[ConditionalCache] = None) -> TestEngine:
+    """Factory method to create the engine selected in the configuration"""
+    load_engine = ENGINES.get(config.engine)
+    if load_engine is None:
+        raise ValueError(f"Invalid engine: {config.engine}. Must be one of: {', '.join(ENGINES)}")
+    if config.check_method not in CHECK_METHODS:
+        raise ValueError(f"Invalid check method: {config.check_method}. "
+                         f"Must be one of: {', '.join(CHECK_METHODS)}")
+    return load_engine()(config, cache)
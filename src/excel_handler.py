@@ -1,7 +1,7 @@
 """Excel file reading and writing utilities"""
 
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils import get_column_letter
 
@@ -16,52 +16,70 @@ class ExcelReader:
         """Check if file exists"""
         return self.file_path.exists()
     
-    def read_rows(self, required_columns: List[str]) -> List[Dict[str, str]]:
+    def count_rows(self) -> Optional[int]:
+        """Number of data rows according to the sheet dimensions (None if the file does not record them)"""
+        wb = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            max_row = wb.active.max_row
+        finally:
+            wb.close()
+        return max(max_row - 1, 0) if max_row else None
+    
+    def read_rows(self, required_columns: List[str]) -> Iterator[Dict[str, str]]:
         """
-        Read rows from Excel file as dictionaries
+        Lazily read rows from Excel file as dictionaries
+        
+        The workbook is opened in read-only mode and rows are yielded as
+        openpyxl parses them, so the first URLs can be tested while the
+        rest of a large file is still being read.
         
         Args:
             required_columns: List of required column names
             
         Returns:
-            List of dictionaries with column names as keys
+            Iterator of dictionaries with column names as keys
             
         Raises:
-            ValueError: If required columns are missing
+            ValueError: If required columns are missing (on the first iteration)
         """
         wb = load_workbook(self.file_path, read_only=True, data_only=True)
-        ws = wb.active
-        
-        # Get headers from first row
-        headers = [cell.value for cell in ws[1]]
-        
-        # Validate required columns
-        missing_columns = [col for col in required_columns if col not in headers]
-        if missing_columns:
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            
+            # Get headers from first row
+            headers = list(next(rows, ()))
+            
+            # Validate required columns
+            missing_columns = [col for col in required_columns if col not in headers]
+            if missing_columns:
+                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+            
+            # Get column indices
+            col_indices = [(col, headers.index(col)) for col in headers if col]
+            
+            # Read data rows
+            for row in rows:
+                yield {col_name: str(row[col_idx]).strip() if col_idx < len(row) and row[col_idx] else None
+                       for col_name, col_idx in col_indices}
+        finally:
             wb.close()
-            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-        
-        # Get column indices
-        col_indices = {col: headers.index(col) for col in headers if col}
-        
-        # Read data rows
-        rows = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            row_dict = {}
-            for col_name, col_idx in col_indices.items():
-                value = row[col_idx]
-                row_dict[col_name] = str(value).strip() if value else None
-            rows.append(row_dict)
-        
-        wb.close()
-        return rows
 
 
 class ExcelWriter:
     """Handles writing data to Excel files"""
     
+    # Rows buffered to size the columns before streaming starts
+    # (write-only sheets must declare column widths before the first row)
+    WIDTH_SAMPLE_ROWS = 1000
+    MAX_COLUMN_WIDTH = 50
+    
     def __init__(self, file_path: str):
         self.file_path = Path(file_path)
+        self._wb = None
+        self._ws = None
+        self._widths = []
+        self._sample = []
+        self._streaming = False
     
     def write_data(self, headers: List[str], rows: List[Dict[str, str]]):
         """
@@ -71,39 +89,57 @@ class ExcelWriter:
             headers: List of column headers
             rows: List of dictionaries containing row data
         """
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Errors"
-        
-        # Write headers
-        ws.append(headers)
-        
-        # Write data rows
+        self.open(headers)
         for row_dict in rows:
-            row = [row_dict.get(header, '') for header in headers]
-            ws.append(row)
-        
-        # Auto-adjust column widths
-        self._adjust_column_widths(ws, headers)
+            self.append([row_dict.get(header, '') for header in headers])
+        self.close()
+    
+    def open(self, headers: List[str], title: str = "Errors"):
+        """Start a write-only workbook; rows are streamed to disk as they are appended"""
+        self._wb = Workbook(write_only=True)
+        self._new_sheet(headers, title)
+    
+    def add_sheet(self, headers: List[str], title: str):
+        """Finish the current sheet and append further rows to a new one"""
+        if not self._streaming:
+            self._start_streaming()
+        self._new_sheet(headers, title)
+    
+    def append(self, row: List):
+        """Append one row of values in header order"""
+        if self._streaming:
+            self._ws.append(row)
+            return
         
-        # Save workbook
-        wb.save(self.file_path)
+        # Track column widths incrementally while sampling
+        for idx, value in enumerate(row):
+            if value is not None:
+                length = len(str(value))
+                if length > self._widths[idx]:
+                    self._widths[idx] = length
+        self._sample.append(row)
+        if len(self._sample) > self.WIDTH_SAMPLE_ROWS:
+            self._start_streaming()
     
-    def _adjust_column_widths(self, ws, headers: List[str]):
-        """Adjust column widths based on content"""
-        for idx, col in enumerate(headers, 1):
-            column_letter = get_column_letter(idx)
-            max_length = len(col)
-            
-            for cell in ws[column_letter]:
-                try:
-                    cell_length = len(str(cell.value))
-                    if cell_length > max_length:
-                        max_length = cell_length
-                except:
-                    pass
-            
+    def close(self):
+        """Write any buffered rows and save the workbook"""
+        if not self._streaming:
+            self._start_streaming()
+        self._wb.save(self.file_path)
+        self._wb = self._ws = None
+    
+    def _new_sheet(self, headers: List[str], title: str):
+        self._ws = self._wb.create_sheet(title)
+        self._widths = [len(header) for header in headers]
+        self._sample = [headers]
+        self._streaming = False
+    
+    def _start_streaming(self):
+        """Fix column widths from the sample and flush it"""
+        for idx, width in enumerate(self._widths, 1):
             # Set width with max limit
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
+            self._ws.column_dimensions[get_column_letter(idx)].width = min(width + 2, self.MAX_COLUMN_WIDTH)
+        for row in self._sample:
+            self._ws.append(row)
+        self._sample = []
+        self._streaming = True
@@ -0,0 +1,188 @@
+"""HTTP/2 engine: checks multiplexed over a few connections per origin (imported only when selected)"""
+
+import asyncio
+import importlib.util
+import socket
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+try:
+    import httpx
+except ImportError:  # Optional dependency, only needed for the http2 engine
+    httpx = None
+
+from .models import TestConfig
+from .http_client import DEFAULT_HEADERS
+from .http_cache import ConditionalCache
+from .retry import parse_retry_after
+from .engines import CheckOutcome, TestEngine, HEAD_FALLBACK_STATUSES
+from .async_engine import AsyncioEngine
+
+
+# Connection-specific headers are not allowed in HTTP/2 requests
+HTTP2_HEADERS = {name: value for name, value in DEFAULT_HEADERS.items() if name != 'Connection'}
+
+
+class Http2Engine(AsyncioEngine):
+    """
+    Runs checks on the asyncio dispatch loop over httpx HTTP/2 clients
+
+    Each of the http2_connections clients keeps one connection per
+    origin, and a check goes to the client with the fewest streams open
+    on its host. At most http2_max_streams checks share a connection, so
+    a host never gets more than connections x streams checks at once.
+    https origins that do not offer HTTP/2 are answered over HTTP/1.1
+    (negotiated by ALPN). Plain http URLs use HTTP/1.1 unless
+    http2_cleartext is set. Then they are sent as HTTP/2 with prior
+    knowledge, and a host that rejects that falls back to HTTP/1.1.
+    """
+
+    def __init__(self, config: TestConfig, cache: Optional[ConditionalCache] = None):
+        if httpx is None or importlib.util.find_spec('h2') is None:  # httpx speaks HTTP/2 through h2
+            raise ImportError("The http2 engine requires httpx with HTTP/2 support (pip install 'httpx[http2]')")
+        stream_limit = config.http2_connections * config.http2_max_streams
+        if config.host_max_concurrent:
+            stream_limit = min(stream_limit, config.host_max_concurrent)
+        # Skips AsyncioEngine.__init__, which requires aiohttp
+        TestEngine.__init__(self, replace(config, host_max_concurrent=stream_limit), cache)
+        self._streams: Dict[str, List[int]] = {}  # Host -> checks open on each client
+        self._http1_hosts: Set[str] = set()  # Cleartext hosts that rejected HTTP/2
+        self._http2_hosts: Set[str] = set()  # Cleartext hosts that answered over HTTP/2
+
+    @asynccontextmanager
+    async def _open_session(self):
+        config = self.config
+        limits = httpx.Limits(
+            max_connections=-(-config.max_workers // config.http2_connections),  # For HTTP/1.1 origins
+            max_keepalive_connections=config.pool_maxsize or config.max_workers
+        )
+        options = {
+            'headers': dict(HTTP2_HEADERS, **{'User-Agent': config.user_agent}),
+            'timeout': httpx.Timeout(config.timeout),
+            'follow_redirects': True,
+            'max_redirects': 30,
+        }
+
+        def mounts():
+            # https negotiates the protocol by ALPN; http uses HTTP/2 with prior knowledge only if asked.
+            # The transport is chosen per request, so redirects between schemes use the right one.
+            return {
+                'http://': httpx.AsyncHTTPTransport(http1=not config.http2_cleartext, http2=True, limits=limits),
+                'https://': httpx.AsyncHTTPTransport(http1=True, http2=True, limits=limits),
+            }
+
+        clients = [httpx.AsyncClient(mounts=mounts(), **options) for _ in range(config.http2_connections)]
+        fallback = httpx.AsyncClient(limits=limits, **options) if config.http2_cleartext else None
+        try:
+            yield SimpleNamespace(clients=clients, fallback=fallback)
+        finally:
+            for client in clients + ([fallback] if fallback else []):
+                await client.aclose()
+
+    async def _check(self, session, url: str, trace: SimpleNamespace) -> CheckOutcome:
+        try:
+            hostname = urlsplit(url).hostname
+            if self.dns_cache is not None and hostname:
+                start = time.perf_counter()
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.dns_cache.resolve, hostname)
+                finally:
+                    trace.timing.dns = (time.perf_counter() - start) * 1000
+            entry = self._cached_entry(url)
+            response = await self._fetch_multiplexed(session, url, entry.conditional_headers() if entry else None,
+                                                     trace)
+            status_code = self._final_status(url, entry, response.status_code, response.headers)
+            return CheckOutcome(status_code, retry_after=parse_retry_after(response.headers.get('Retry-After')))
+
+        except socket.gaierror as e:
+            return CheckOutcome('DNS_ERROR', str(e))
+        except httpx.TimeoutException:
+            return CheckOutcome('TIMEOUT', self._timeout_message())
+        except httpx.TooManyRedirects:
+            return CheckOutcome('TOO_MANY_REDIRECTS', 'Too many redirects')
+        except httpx.TransportError:
+            return CheckOutcome('CONNECTION_ERROR', 'Connection failed')
+        except Exception as e:
+            return CheckOutcome('ERROR', str(e))
+
+    async def _fetch_multiplexed(self, session, url: str, headers: Optional[dict], trace: SimpleNamespace):
+        """Send the check over the least busy client for its host, falling back to HTTP/1.1 if rejected"""
+        parts = urlsplit(url)
+        host = parts.netloc
+        cleartext = session.fallback is not None and parts.scheme == 'http'
+        if cleartext and host in self._http1_hosts:
+            return await self._fetch(session.fallback, url, headers, trace)
+
+        streams = self._streams.setdefault(host, [0] * len(session.clients))
+        index = streams.index(min(streams))
+        streams[index] += 1
+        try:
+            response = await self._fetch(session.clients[index], url, headers, trace)
+        except (httpx.RemoteProtocolError, httpx.ReadError, httpx.WriteError):
+            if not cleartext or host in self._http2_hosts:
+                raise
+            # The server did not understand the HTTP/2 connection preface and hung up
+            # (checks queued on the same connection see the closed socket)
+            self._http1_hosts.add(host)
+            return await self._fetch(session.fallback, url, headers, trace)
+        finally:
+            streams[index] -= 1
+        if cleartext:
+            self._http2_hosts.add(host)
+        return response
+
+    async def _fetch(self, client, url: str, headers: Optional[dict] = None, trace: SimpleNamespace = None):
+        """Request the URL with the configured check method and return the response"""
+        method = self.config.check_method
+        options = {'headers': headers, 'extensions': {'trace': self._tracer(trace)}}
+
+        if method == 'head':
+            response = await client.head(url, **options)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                self.connection_stats.record_http_version(response.http_version)
+                return response
+            method = 'stream'
+
+        # Leaving the stream early resets only this stream; the connection stays open
+        async with client.stream('GET', url, **options) as response:
+            if method == 'stream':
+                if self.config.max_body_bytes > 0:
+                    async for _ in response.aiter_raw(self.config.max_body_bytes):
+                        break
+            else:
+                async for _ in response.aiter_raw():
+                    pass
+            self.connection_stats.record_bytes(response.num_bytes_downloaded)
+        self.connection_stats.record_http_version(response.http_version)
+        return response
+
+    def _tracer(self, trace: SimpleNamespace):
+        """
+        httpcore trace callback feeding ConnectionStats and the timing of a check
+
+        Events of redirect hops are included, as with the other engines.
+        """
+        stats = self.connection_stats
+        timing = trace.timing
+        started = {}
+
+        async def on_event(name: str, info: dict):
+            now = time.perf_counter()
+            if name.endswith('.started'):
+                started[name] = now
+                if name.endswith('send_request_headers.started'):
+                    stats.record_request()
+                return
+            if name == 'connection.connect_tcp.complete':
+                stats.record_new_connection()
+                timing.connect += (now - started.get('connection.connect_tcp.started', now)) * 1000
+            elif name == 'connection.start_tls.complete':
+                timing.tls += (now - started.get('connection.start_tls.started', now)) * 1000
+            elif name.endswith('receive_response_headers.complete') and not timing.ttfb:
+                timing.ttfb = (now - trace.start) * 1000
+
+        return on_event
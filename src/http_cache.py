@@ -0,0 +1,184 @@
+"""Persistent ETag / Last-Modified cache for conditional requests on repeat runs"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+
+COMMIT_EVERY = 500  # Writes batched per SQLite transaction
+
+
+@dataclass
+class CacheEntry:
+    """Validators and outcome stored for one URL"""
+    url: str
+    status_code: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    checked_at: float
+    body_path: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that let the server answer 304 Not Modified"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ConditionalCache:
+    """
+    SQLite-backed validator cache keyed by the full tested URL
+
+    Entries older than max_age are ignored and purged. When the cache
+    grows past max_entries, the least recently checked URLs are evicted.
+    Sitemap bodies are kept as files next to the database so a 304 can
+    be parsed from the local copy.
+    """
+
+    def __init__(self, file_path: str, max_entries: int = 1000000, max_age: float = 7 * 86400):
+        """
+        Args:
+            file_path: SQLite database file (created if missing)
+            max_entries: Maximum number of URLs kept
+            max_age: Seconds after which an entry is no longer used
+        """
+        self.file_path = Path(file_path)
+        self.body_dir = self.file_path.with_name(self.file_path.name + '_bodies')
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0  # Page checks answered with 304 Not Modified
+        self.sitemap_hits = 0  # Sitemap downloads answered with 304 Not Modified
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._db = sqlite3.connect(str(self.file_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY, status INTEGER, etag TEXT, last_modified TEXT,"
+            " checked_at REAL, body_path TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_checked_at ON entries (checked_at)")
+        self._db.commit()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Return the stored entry for a URL, or None if missing or expired"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, etag, last_modified, checked_at, body_path"
+                " FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        if time.time() - entry.checked_at > self.max_age:
+            return None
+        return entry
+
+    def store(self, url: str, status_code: int, headers, body_path: Optional[str] = None):
+        """
+        Remember a fresh response if it carries validators
+
+        Args:
+            url: Full URL that was requested
+            status_code: Final HTTP status
+            headers: Response headers (case-insensitive mapping)
+            body_path: Local copy of the body (sitemaps only)
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        self._write(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (url, status_code, etag, last_modified, time.time(), body_path)
+        )
+
+    def revalidated(self, entry: CacheEntry, sitemap: bool = False):
+        """Record a 304 for a cached entry (a sitemap's or a page's) and refresh its check time"""
+        self._write("UPDATE entries SET checked_at = ? WHERE url = ?", (time.time(), entry.url))
+        with self._lock:
+            if sitemap:
+                self.sitemap_hits += 1
+            else:
+                self.hits += 1
+
+    def body_path_for(self, url: str) -> Path:
+        """Local file used to keep the body of a URL"""
+        self.body_dir.mkdir(parents=True, exist_ok=True)
+        return self.body_dir / (hashlib.sha1(url.encode('utf-8')).hexdigest() + '.body')
+
+    def close(self):
+        """Purge expired entries, apply the size bound and commit"""
+        with self._lock:
+            cutoff = time.time() - self.max_age
+            self._delete_bodies("SELECT body_path FROM entries WHERE checked_at < ?", (cutoff,))
+            self._db.execute("DELETE FROM entries WHERE checked_at < ?", (cutoff,))
+
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                oldest = "SELECT url FROM entries ORDER BY checked_at LIMIT ?"
+                self._delete_bodies(
+                    f"SELECT body_path FROM entries WHERE url IN ({oldest})", (excess,)
+                )
+                self._db.execute(f"DELETE FROM entries WHERE url IN ({oldest})", (excess,))
+
+            self._db.commit()
+            self._db.close()
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self._db.execute(sql, params)
+            self._pending_writes += 1
+            if self._pending_writes >= COMMIT_EVERY:
+                self._db.commit()
+                self._pending_writes = 0
+
+    def _delete_bodies(self, sql: str, params: tuple):
+        for (body_path,) in self._db.execute(sql, params).fetchall():
+            if body_path:
+                try:
+                    os.remove(body_path)
+                except OSError:
+                    pass
+
+
+class TeeReader(io.RawIOBase):
+    """Raw stream that copies everything read from `source` into a file"""
+
+    def __init__(self, source, copy_path: Path):
+        self.source = source
+        self.copy_path = copy_path
+        self.temp_path = copy_path.with_name(copy_path.name + '.part')
+        self._copy = open(self.temp_path, 'wb')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self.source.readinto(buffer)
+        if count:
+            self._copy.write(memoryview(buffer)[:count])
+        return count
+
+    def commit(self) -> str:
+        """Finish the copy and move it into place; returns its path"""
+        self._copy.close()
+        os.replace(self.temp_path, self.copy_path)
+        return str(self.copy_path)
+
+    def discard(self):
+        """Drop an incomplete copy"""
+        self._copy.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
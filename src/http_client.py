@@ -0,0 +1,260 @@
+"""Pooled HTTP session with keep-alive connection reuse tracking"""
+
+import socket
+import threading
+import time
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:  # urllib3 1.26, which reports lookup failures as NewConnectionError
+    NameResolutionError = None
+
+from .models import TestConfig, RequestTiming
+from .dns_cache import DNSCache
+
+
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive'
+}
+POOL_HOSTS_PER_WORKER = 4  # Cap on automatically sized pools: idle keep-alive sockets cost file descriptors
+
+
+class ConnectionStats:
+    """Thread-safe counters for requests sent, connections opened and body bytes read"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.bytes_received = 0
+        self.http_versions = {}  # 'HTTP/2' / 'HTTP/1.1' -> responses (recorded by the http2 engine)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.opened += 1
+
+    def record_bytes(self, count: int):
+        with self._lock:
+            self.bytes_received += count
+
+    def record_http_version(self, version: str):
+        with self._lock:
+            self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+    @property
+    def reused(self) -> int:
+        """Requests that were sent over an already open connection"""
+        return max(self.requests - self.opened, 0)
+
+
+class ConnectionHooks:
+    """Shared state that pooled connections report to and resolve through"""
+
+    def __init__(self, stats: ConnectionStats, dns_cache: Optional[DNSCache] = None):
+        self.stats = stats
+        self.dns_cache = dns_cache
+        self._local = threading.local()  # Timing of the check running on each worker thread
+
+    def begin(self, timing: RequestTiming):
+        """Attribute connection phases on this thread to `timing` until end()"""
+        self._local.timing = timing
+        self._local.start = time.perf_counter()
+
+    def end(self):
+        self._local.timing = None
+
+    @property
+    def timing(self) -> Optional[RequestTiming]:
+        return getattr(self._local, 'timing', None)
+
+    def first_byte(self):
+        """Record time to first byte for the current check (first response only)"""
+        timing = self.timing
+        if timing is not None and not timing.ttfb:
+            timing.ttfb = (time.perf_counter() - self._local.start) * 1000
+
+
+class _HookedConnectionMixin:
+    """
+    Counts every socket a urllib3 connection opens, resolves via the DNS
+    cache and times the connect, TLS and first-byte phases
+    """
+
+    hooks = None
+    is_tls = False
+    _socket_ms = 0.0
+
+    def connect(self):
+        timing = self.hooks.timing if self.hooks is not None else None
+        start = time.perf_counter()
+        self._socket_ms = 0.0
+        super().connect()
+        if timing is not None:
+            timing.connect += self._socket_ms
+            if self.is_tls:
+                timing.tls += (time.perf_counter() - start) * 1000 - self._socket_ms
+
+    def _new_conn(self):
+        hooks = self.hooks
+        addresses = [None]  # None = let urllib3 resolve and try the addresses itself
+        if hooks is not None:
+            hooks.stats.record_new_connection()
+            if hooks.dns_cache is not None:
+                try:
+                    addresses = [address for _, address in hooks.dns_cache.resolve_all(self.host)]
+                except socket.gaierror as e:
+                    if NameResolutionError is None:
+                        raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+                    raise NameResolutionError(self.host, self, e) from e
+        start = time.perf_counter()
+        try:
+            # Like socket.create_connection, try each address in turn (IPv6 then IPv4 on
+            # dual-stack hosts), so one dead address does not fail the host.
+            # TLS still verifies and sends SNI for self.host; only the socket target changes.
+            for index, address in enumerate(addresses):
+                if address is not None:
+                    self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError):
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._socket_ms = (time.perf_counter() - start) * 1000
+
+    def getresponse(self):
+        response = super().getresponse()
+        if self.hooks is not None:
+            self.hooks.first_byte()
+        return response
+
+
+class _HookedHTTPConnection(_HookedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _HookedHTTPSConnection(_HookedConnectionMixin, HTTPSConnection):
+    is_tls = True
+
+
+class _HookedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HookedHTTPConnection
+    hooks = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.hooks = self.hooks
+        return conn
+
+
+class _HookedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HookedHTTPSConnection
+    hooks = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.hooks = self.hooks
+        return conn
+
+
+class _HookedPoolManager(PoolManager):
+    """PoolManager whose connections report to and resolve through ConnectionHooks"""
+
+    def __init__(self, *args, hooks: ConnectionHooks, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hooks = hooks
+        self.pool_classes_by_scheme = {
+            'http': _HookedHTTPConnectionPool,
+            'https': _HookedHTTPSConnectionPool
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.hooks = self.hooks
+        return pool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests and newly opened connections"""
+
+    def __init__(self, hooks: ConnectionHooks, max_pools: int = 0, **kwargs):
+        """
+        Args:
+            hooks: Connection counters, DNS cache and per-check timing
+            max_pools: Most hosts reserve_pools may keep pools for (0 = the pool count is fixed)
+        """
+        self.hooks = hooks
+        self.max_pools = max_pools
+        super().__init__(**kwargs)
+
+    def reserve_pools(self, hosts: int):
+        """
+        Keep connection pools for at least `hosts` hosts (up to max_pools)
+
+        The pools are kept least recently used first, so with fewer pools
+        than the hosts being interleaved round-robin, every request would
+        evict the pool (and the keep-alive connections) the next one needs.
+        The count only grows; pools themselves are created on first use.
+        """
+        pools = self.poolmanager.pools
+        hosts = min(hosts, self.max_pools)
+        if hosts > pools._maxsize:  # RecentlyUsedContainer has no public way to resize
+            pools._maxsize = hosts
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _HookedPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            hooks=self.hooks,
+            **pool_kwargs
+        )
+
+    def send(self, request, **kwargs):
+        self.hooks.stats.record_request()
+        return super().send(request, **kwargs)
+
+
+def create_session(config: TestConfig, hooks: ConnectionHooks) -> requests.Session:
+    """
+    Create a shared keep-alive session sized for the configured concurrency
+
+    Args:
+        config: Test configuration (pool settings, user agent)
+        hooks: Connection counters, DNS cache and per-check timing
+
+    Returns:
+        Session whose HTTP and HTTPS adapters share the connection pools
+    """
+    pool_maxsize = config.pool_maxsize or config.max_workers
+    adapter = PooledHTTPAdapter(
+        hooks,
+        # Without a fixed count the engine grows the pools with the hosts it interleaves (reserve_pools)
+        max_pools=0 if config.pool_connections else config.max_workers * POOL_HOSTS_PER_WORKER,
+        pool_connections=config.pool_connections or requests.adapters.DEFAULT_POOLSIZE,
+        pool_maxsize=pool_maxsize,
+        pool_block=config.pool_block
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers['User-Agent'] = config.user_agent
+    return session
@@ -0,0 +1,155 @@
+"""Incremental runs: re-test only the URLs that are new, changed or failing since the previous run"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from .dedupe import url_digest
+from .models import URLTestRequest, TestResult, TestConfig, format_timestamp
+
+
+COMMIT_EVERY = 500  # Writes batched per SQLite transaction
+FORGET_AFTER_RUNS = 30  # URLs missing from this many consecutive runs are dropped from the state
+SKIPPED_HEADERS = ['tested_url', 'lastmod', 'last_status', 'last_error', 'last_tested_at']
+
+
+class IncrementalState:
+    """
+    SQLite record of every URL's <lastmod> and last outcome, carried from run to run
+
+    A URL is re-tested when it is new, when its sitemap <lastmod> differs
+    from the stored one, when it did not pass last time, or when it falls
+    in this run's rolling sample. The sample splits the URLs into
+    1 / sample buckets by hash and takes the next bucket each run, so
+    every unchanged URL is re-tested at least once per cycle. All other
+    URLs are skipped and listed with their last known outcome (see
+    skipped_rows).
+
+    URLs without a <lastmod> (defined lists, sitemaps that omit it) count
+    as unchanged, so they are re-tested only when new, failing or
+    sampled.
+
+    select() runs on the engine's input thread while record() runs on
+    the dispatch loop, so the database is shared under a lock.
+    """
+
+    def __init__(self, file_path: str, sample: float = 0.05, resume: bool = False):
+        """
+        Args:
+            file_path: SQLite database file (created if missing)
+            sample: Share of unchanged URLs re-tested per run (0 = none)
+            resume: Continue the previous run's numbering, so its skipped URLs stay listed
+        """
+        self.file_path = Path(file_path)
+        self.buckets = max(round(1 / sample), 1) if sample > 0 else 0
+        self.new = 0
+        self.changed = 0
+        self.failed = 0
+        self.sampled = 0
+        self.skipped = 0
+        self._lastmods = {}  # Tested URL -> <lastmod>, for URLs selected but not finished yet
+        self._selected: Dict[int, bool] = {}  # Digest of each URL seen this run -> whether it was selected
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.file_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY, lastmod TEXT, status, error TEXT, checked_at REAL,"
+            " seen_run INTEGER, tested_run INTEGER)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        last_run = row[0] if row else 0
+        self.run = last_run if resume and last_run else last_run + 1
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('run', ?)", (self.run,))
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config: TestConfig, resume: bool = False) -> 'IncrementalState':
+        return cls(config.incremental_state, sample=config.incremental_sample, resume=resume)
+
+    def select(self, url_requests: Iterable[URLTestRequest]) -> Iterator[URLTestRequest]:
+        """
+        Yield the URLs that need a check this run and mark the others as skipped
+
+        A URL listed more than once is counted once; its other rows follow
+        the decision made for the first.
+        """
+        for url_request in url_requests:
+            full_url = url_request.get_full_url()
+            digest = url_digest(full_url)
+            selected = self._selected.get(digest)
+            if selected is not None:
+                if selected:
+                    yield url_request
+                continue
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT lastmod, status FROM urls WHERE url = ?", (full_url,)
+                ).fetchone()
+            if row is None:
+                self.new += 1
+            elif url_request.lastmod != row[0]:
+                self.changed += 1
+            elif row[1] != 200:
+                self.failed += 1
+            elif self.buckets and digest % self.buckets == self.run % self.buckets:
+                self.sampled += 1
+            else:
+                self.skipped += 1
+                self._selected[digest] = False
+                self._write("UPDATE urls SET seen_run = ? WHERE url = ?", (self.run, full_url))
+                continue
+            self._selected[digest] = True
+            self._lastmods[full_url] = url_request.lastmod
+            yield url_request
+
+    def record(self, result: TestResult):
+        """Store the outcome of a URL selected by this run"""
+        if result.tested_url not in self._lastmods:
+            return
+        self._write(
+            "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (result.tested_url, self._lastmods.pop(result.tested_url), result.status_code,
+             result.error_message, result.tested_at, self.run, self.run)
+        )
+
+    def discard(self, url_request: URLTestRequest):
+        """Forget a URL whose check raised; its stored outcome is kept for the next run"""
+        self._lastmods.pop(url_request.get_full_url(), None)
+
+    def skipped_rows(self) -> Iterator[List]:
+        """Report rows for the URLs skipped in this run, with their last known outcome"""
+        # Called once testing has finished, so no other thread uses the database any more
+        self._db.commit()
+        self._pending_writes = 0
+        rows = self._db.execute(
+            "SELECT url, lastmod, status, error, checked_at FROM urls"
+            " WHERE seen_run = ? AND tested_run < ? ORDER BY url", (self.run, self.run)
+        )
+        for url, lastmod, status, error, checked_at in rows:
+            yield [url, lastmod or '', str(status), error, format_timestamp(checked_at)]
+
+    @property
+    def selected(self) -> int:
+        return self.new + self.changed + self.failed + self.sampled
+
+    def summary(self) -> str:
+        return (f"{self.new} new, {self.changed} changed, {self.failed} failed last time, "
+                f"{self.sampled} sampled; {self.skipped} skipped (unchanged and passing)")
+
+    def close(self):
+        """Drop URLs that have left the inputs and commit"""
+        with self._lock:
+            self._db.execute("DELETE FROM urls WHERE seen_run <= ?", (self.run - FORGET_AFTER_RUNS,))
+            self._db.commit()
+            self._db.close()
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self._db.execute(sql, params)
+            self._pending_writes += 1
+            if self._pending_writes >= COMMIT_EVERY:
+                self._db.commit()
+                self._pending_writes = 0
@@ -0,0 +1,101 @@
+"""Background reading of the URL input, so a slow provider never blocks the dispatch loop"""
+
+import queue
+import threading
+from typing import Iterable, Optional
+
+from .models import URLTestRequest
+
+
+INPUT_POLL = 0.05  # Seconds between looks at the input while the engine is waiting for URLs
+_END = object()  # Queued after the last URL
+
+
+class InputFeed:
+    """
+    Reads the input iterator on its own thread into a bounded queue
+
+    Providers may block: a sitemap stalls mid-download, stdin waits for
+    its writer. Pulling them from the dispatch loop would stop it from
+    collecting finished checks (and, on the asyncio engine, stall every
+    check in flight until it times out). The engines take URLs with
+    get(), which never blocks, and wait() only when they have nothing
+    else to do. An exception raised by the input is re-raised by get()
+    once the URLs before it have been taken.
+    """
+
+    def __init__(self, url_requests: Iterable[URLTestRequest], size: int):
+        """
+        Args:
+            url_requests: URLs to test (may be a lazy generator)
+            size: URLs read ahead of the engine
+        """
+        self._iterator = iter(url_requests)
+        self._queue = queue.Queue(maxsize=max(size, 1))
+        self._next = None  # URL taken by wait(), handed out by the next get()
+        self._error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read, name='input', daemon=True)
+        self.exhausted = False  # The last URL has been taken
+        self.starved = False  # The last get() found no URL although the input has not ended
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        """Stop reading; a read already blocked in the input finishes on its own (the thread is a daemon)"""
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def get(self) -> Optional[URLTestRequest]:
+        """Next URL if one has been read, else None (see exhausted and starved)"""
+        if self._next is not None:
+            url_request, self._next = self._next, None
+            return url_request
+        if self.exhausted:
+            return None
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            self.starved = True
+            return None
+        return self._take(item)
+
+    def wait(self, timeout: float):
+        """Block until a URL is available or the input has ended, for at most `timeout` seconds"""
+        if self._next is not None or self.exhausted:
+            return
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self._next = self._take(item)
+
+    def _take(self, item) -> Optional[URLTestRequest]:
+        if item is _END:
+            self.exhausted = True
+            self.starved = False
+            if self._error is not None:
+                raise self._error
+            return None
+        self.starved = False
+        return item
+
+    def _read(self):
+        try:
+            for url_request in self._iterator:
+                if not self._put(url_request):
+                    return
+        except Exception as e:
+            self._error = e
+        self._put(_END)
+
+    def _put(self, item) -> bool:
+        """Block until the engine takes the item; False once it has stopped reading"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,150 @@
+"""Append-only result journal for crash-safe, resumable runs"""
+
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .models import TestResult, RequestTiming, URLTestRequest, intern_status, parse_timestamp
+
+
+FSYNC_INTERVAL = 1.0  # Seconds between forced writes to disk
+
+
+@dataclass
+class JournalState:
+    """Outcome of a previous (possibly interrupted) run, read back from the journal"""
+    # (source URL, tested URL) -> input rows journaled; an input can list the same row more than once
+    tested_rows: Counter = field(default_factory=Counter)
+    failures: List[TestResult] = field(default_factory=list)
+    success_count: int = 0
+    skipped: Dict[str, List] = field(default_factory=dict)  # Tested URL -> report row of a URL an incremental shard skipped
+
+    def __len__(self) -> int:
+        return self.success_count + len(self.failures)
+
+    def untested(self, url_requests: Iterable[URLTestRequest]) -> Iterator[URLTestRequest]:
+        """Yield the input rows that have no result yet (each journaled row accounts for one input row)"""
+        tested = Counter(self.tested_rows)
+        for url_request in url_requests:
+            row = (url_request.url, url_request.get_full_url())
+            if tested.get(row):
+                tested[row] -= 1
+            else:
+                yield url_request
+
+
+class ResultJournal:
+    """
+    JSONL log with one line per completed check
+
+    Every line is flushed as soon as it is written, so a killed process
+    loses at most the line being written. A truncated last line is
+    ignored when the journal is read back.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = Path(file_path)
+        self._file = None
+        self._last_sync = 0.0
+
+    def exists(self) -> bool:
+        """Check if file exists"""
+        return self.file_path.exists()
+
+    def load(self, on_result: Optional[Callable[[TestResult], None]] = None) -> JournalState:
+        """
+        Read every complete record of a previous run
+
+        Args:
+            on_result: Called with every result read, successes included
+        """
+        state = JournalState()
+        if not self.exists():
+            return state
+
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Partially written line from a crash
+                if 'skipped' in record:
+                    row = record['skipped']
+                    state.skipped[row[0]] = row  # A resumed shard lists its skipped URLs again
+                    continue
+                result = TestResult(
+                    source_url=record['source'],
+                    tested_url=record['url'],
+                    status_code=intern_status(record['status']),
+                    error_message=record.get('error', ''),
+                    tested_at=parse_timestamp(record.get('at')),
+                    timing=RequestTiming(*record['ms']) if record.get('ms') else None,
+                    attempts=record.get('n', 1),
+                    duplicate_of=record.get('dup')
+                )
+                state.tested_rows[result.source_url, result.tested_url] += 1
+                if on_result is not None:
+                    on_result(result)
+                if result.is_success:
+                    state.success_count += 1
+                else:
+                    state.failures.append(result)
+
+        return state
+
+    def open(self, append: bool = False):
+        """
+        Open the journal for writing
+
+        Args:
+            append: Keep existing records (resume) instead of starting a new journal
+        """
+        if append and self.exists() and self.file_path.stat().st_size:
+            with open(self.file_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+            self._file = open(self.file_path, 'a', encoding='utf-8')
+            if needs_newline:
+                self._file.write('\n')  # Terminate a line cut off by a crash
+        else:
+            self._file = open(self.file_path, 'w', encoding='utf-8')
+        self._last_sync = time.monotonic()
+
+    def write(self, result: TestResult):
+        """Append one result and flush it to the OS"""
+        record = {
+            'source': result.source_url,
+            'url': result.tested_url,
+            'status': result.status_code,
+            'error': result.error_message,
+            'at': round(result.tested_at, 3)
+        }
+        if result.timing is not None:
+            record['ms'] = result.timing.as_list()
+        if result.attempts > 1:
+            record['n'] = result.attempts
+        if result.duplicate_of is not None:
+            record['dup'] = result.duplicate_of
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+        now = time.monotonic()
+        if now - self._last_sync >= FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def write_skipped(self, row: List):
+        """Append the report row of a URL an incremental run skipped (a shard's part of the Skipped table)"""
+        self._file.write(json.dumps({'skipped': row}, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
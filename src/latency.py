@@ -0,0 +1,132 @@
+"""Streaming latency histograms and per-host / per-status percentile summaries"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .models import TestResult, RequestTiming
+from .scheduler import host_of
+
+
+PERCENTILES = (50, 90, 99)
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+LATENCY_HEADERS = ['group', 'key', 'count', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram in the style of HdrHistogram
+
+    Values are recorded in microseconds. Below 128us every value has its
+    own bucket; above that each power of two is split into 64 buckets,
+    so any percentile is within 1/64 (~1.6%) of the true value. Buckets
+    are kept sparsely, so a histogram costs a few hundred counters at
+    most, however many values are recorded.
+    """
+
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    HALF_SUB_BUCKETS = SUB_BUCKETS >> 1
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def record(self, value_ms: float):
+        value = max(int(value_ms * 1000), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum_us += value
+        if value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, percent: float) -> float:
+        """Value in milliseconds below which `percent` of the recorded values fall"""
+        if not self.count:
+            return 0.0
+        target = max(1, -(-self.count * percent // 100))  # ceil without floats
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    @property
+    def max(self) -> float:
+        return self.max_us / 1000
+
+    @property
+    def sum(self) -> float:
+        return self.sum_us / 1000
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        if value < cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        return cls.SUB_BUCKETS + (shift - 1) * cls.HALF_SUB_BUCKETS + (value >> shift) - cls.HALF_SUB_BUCKETS
+
+    @classmethod
+    def _value(cls, index: int) -> int:
+        """Midpoint of the values that map to a bucket"""
+        if index < cls.SUB_BUCKETS:
+            return index
+        shift, offset = divmod(index - cls.SUB_BUCKETS, cls.HALF_SUB_BUCKETS)
+        shift += 1
+        return ((offset + cls.HALF_SUB_BUCKETS) << shift) + (1 << (shift - 1))
+
+
+class LatencyStats:
+    """Histograms of every phase overall, and of total time per host and per status"""
+
+    def __init__(self):
+        self.phases = {phase: LatencyHistogram() for phase in PHASES}
+        self.by_host: Dict[str, LatencyHistogram] = {}
+        self.by_status: Dict[str, LatencyHistogram] = {}
+
+    def __len__(self) -> int:
+        return self.phases['total'].count
+
+    def record(self, result: TestResult):
+        """Add a result's timing (results without timing are ignored)"""
+        timing: Optional[RequestTiming] = result.timing
+        if timing is None:
+            return
+        for phase, histogram in self.phases.items():
+            histogram.record(getattr(timing, phase))
+
+        for groups, key in ((self.by_host, host_of(result.tested_url)),
+                            (self.by_status, str(result.status_code))):
+            histogram = groups.get(key)
+            if histogram is None:
+                histogram = groups[key] = LatencyHistogram()
+            histogram.record(timing.total)
+
+    def rows(self) -> List[List]:
+        """Report rows in LATENCY_HEADERS order: phases, then statuses, then hosts (slowest first)"""
+        rows = [self._row('phase', phase, histogram) for phase, histogram in self.phases.items()]
+        rows += [self._row('status', status, histogram)
+                 for status, histogram in sorted(self.by_status.items())]
+        rows += [self._row('host', host, histogram)
+                 for host, histogram in self.slowest_hosts()]
+        return rows
+
+    def slowest_hosts(self, limit: Optional[int] = None) -> List[Tuple[str, LatencyHistogram]]:
+        """Hosts ordered by their p99 total time, slowest first"""
+        hosts = sorted(self.by_host.items(), key=lambda item: item[1].percentile(99), reverse=True)
+        return hosts[:limit] if limit else hosts
+
+    @staticmethod
+    def _row(group: str, key: str, histogram: LatencyHistogram) -> List:
+        return [group, key, histogram.count] + [
+            round(histogram.percentile(p), 1) for p in PERCENTILES
+        ] + [round(histogram.max, 1)]
@@ -0,0 +1,224 @@
+"""Live metrics of a running test, served over local HTTP as Prometheus text and JSON"""
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from .latency import LatencyHistogram, LatencyStats, PERCENTILES
+from .models import ResultCounts
+
+
+METRIC_HOSTS = 100  # Busiest hosts exported individually (bounds the number of series)
+RATE_WINDOW = 10.0  # Seconds covered by the live rates
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _quantiles(histogram: LatencyHistogram) -> Dict[str, float]:
+    """Count, sum, p50/p90/p99 and max in ms of a copy of the histogram (safe while it is being recorded)"""
+    snapshot = LatencyHistogram()
+    snapshot.counts = dict(histogram.counts)  # Copied in one step, so the writer never has to wait
+    snapshot.count = sum(snapshot.counts.values())
+    snapshot.sum_us = histogram.sum_us
+    snapshot.max_us = histogram.max_us
+    quantiles = {'count': snapshot.count, 'sum': round(snapshot.sum, 3)}
+    quantiles.update({f'p{percent}': round(snapshot.percentile(percent), 3) for percent in PERCENTILES})
+    quantiles['max'] = round(snapshot.max, 3)
+    return quantiles
+
+
+class MetricsServer:
+    """
+    Serves live counters of a run at /metrics (Prometheus) and /metrics.json
+
+    Little is added to the result-collection path (a per-host count): a
+    scrape reads the counters that the collecting thread keeps anyway
+    (ResultCounts, LatencyStats, the engine's in-flight and retry
+    counters), the same way the progress reporter does. Those have a single writer, so
+    plain reads are consistent enough, and the histograms are copied
+    before their quantiles are computed. The rates come from the
+    server's own samples of the counters, taken at each scrape.
+    """
+
+    def __init__(self, counts: ResultCounts, host_counts: Dict[str, int], latency: LatencyStats, engine,
+                 total: Optional[int] = None, port: int = 9100, host: str = '127.0.0.1'):
+        """
+        Args:
+            counts: Counters updated by the result callbacks
+            host_counts: Results per host (including those without timing), updated by the result callbacks
+            latency: Histograms updated by the result callbacks
+            engine: Running engine (in-flight and queued snapshot, retries, connections)
+            total: Number of URLs if known
+            port: Port to listen on (0 = any free port)
+            host: Address to listen on (local only by default)
+        """
+        self.counts = counts
+        self.host_counts = host_counts
+        self.latency = latency
+        self.engine = engine
+        self.total = total
+        self._start = time.monotonic()
+        self._samples = deque()  # (monotonic time, completed, {host: completed}) of recent scrapes
+        self._samples_lock = threading.Lock()  # Only scrapes take it
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._start = time.monotonic()
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def snapshot(self) -> dict:
+        """Current metrics as plain data (the JSON format)"""
+        counts = self.counts
+        engine = self.engine
+        now = time.monotonic()
+        completed = counts.total
+        host_counts = dict(self.host_counts)
+        rate, host_rates = self._rates(now, completed, host_counts)
+        elapsed = now - self._start
+
+        busiest = sorted(host_counts.items(), key=lambda item: item[1], reverse=True)[:METRIC_HOSTS]
+        by_host = self.latency.by_host
+        stats = engine.connection_stats
+        retry = engine.retry
+        dedupe = engine.dedupe
+        breaker = engine.breaker
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'total': self.total,
+            'completed': completed,
+            'success': counts.success,
+            'errors': counts.errors,
+            'in_flight': engine.in_flight,
+            'queued': engine.queued,
+            'rate': {'window': round(rate, 2), 'overall': round(completed / elapsed, 2) if elapsed > 0 else 0.0},
+            'statuses': {str(status): count for status, count in dict(counts.by_status).items()},
+            'retries': {'retried': retry.retries if retry else 0,
+                        'budget_exhausted': retry.budget_exhausted if retry else 0},
+            'duplicates': dedupe.duplicates if dedupe else 0,
+            'circuit_opened': breaker.opened if breaker else 0,
+            'connections': {'opened': stats.opened, 'reused': stats.reused, 'bytes_received': stats.bytes_received},
+            'latency_ms': {phase: _quantiles(histogram) for phase, histogram in self.latency.phases.items()},
+            'hosts': {
+                # The quantiles (and their count) cover the results that were timed
+                host: dict(_quantiles(by_host.get(host) or LatencyHistogram()), completed=count,
+                           rate=round(host_rates.get(host, 0.0), 2))
+                for host, count in busiest
+            },
+        }
+
+    def prometheus(self) -> str:
+        """Current metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP url_tester_{name} {help_text}")
+            lines.append(f"# TYPE url_tester_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(str(label))}"' for key, label in labels.items())
+                lines.append(f"url_tester_{name}{{{label_text}}} {value}" if label_text
+                             else f"url_tester_{name} {value}")
+
+        metric('urls_completed_total', 'counter', 'URLs with a final result',
+               [({}, snapshot['completed'])])
+        metric('urls_failed_total', 'counter', 'URLs that did not return 200 (including exceptions)',
+               [({}, snapshot['errors'])])
+        if snapshot['total'] is not None:
+            metric('urls', 'gauge', 'URLs in the run', [({}, snapshot['total'])])
+        metric('in_flight', 'gauge', 'Checks running', [({}, snapshot['in_flight'])])
+        metric('queued', 'gauge', 'Checks buffered or waiting for a retry', [({}, snapshot['queued'])])
+        metric('rate', 'gauge', f'URLs completed per second over the last {RATE_WINDOW:g}s',
+               [({}, snapshot['rate']['window'])])
+        metric('results_total', 'counter', 'Results by status code or error type',
+               [({'status': status}, count) for status, count in sorted(snapshot['statuses'].items())])
+        metric('retries_total', 'counter', 'Checks repeated after a retryable failure',
+               [({}, snapshot['retries']['retried'])])
+        metric('retries_budget_exhausted_total', 'counter', 'Retryable failures reported because the budget ran out',
+               [({}, snapshot['retries']['budget_exhausted'])])
+        metric('duplicates_total', 'counter', 'URLs answered from an identical check',
+               [({}, snapshot['duplicates'])])
+        metric('circuit_opened_total', 'counter', 'Times a host was marked down',
+               [({}, snapshot['circuit_opened'])])
+        metric('connections_opened_total', 'counter', 'Connections opened',
+               [({}, snapshot['connections']['opened'])])
+        metric('response_bytes_total', 'counter', 'Response body bytes read',
+               [({}, snapshot['connections']['bytes_received'])])
+
+        latency_samples = []
+        for phase, quantiles in snapshot['latency_ms'].items():
+            for percent in PERCENTILES:
+                latency_samples.append(({'phase': phase, 'quantile': percent / 100},
+                                        round(quantiles[f'p{percent}'] / 1000, 6)))
+        metric('latency_seconds', 'summary', 'Check latency per phase', latency_samples)
+        for phase, quantiles in snapshot['latency_ms'].items():
+            lines.append(f'url_tester_latency_seconds_sum{{phase="{phase}"}} {round(quantiles["sum"] / 1000, 6)}')
+            lines.append(f'url_tester_latency_seconds_count{{phase="{phase}"}} {quantiles["count"]}')
+
+        hosts = snapshot['hosts'].items()
+        metric('host_urls_completed_total', 'counter', f'URLs completed per host ({METRIC_HOSTS} busiest hosts)',
+               [({'host': host}, values['completed']) for host, values in hosts])
+        metric('host_rate', 'gauge', f'URLs completed per second per host over the last {RATE_WINDOW:g}s',
+               [({'host': host}, values['rate']) for host, values in hosts])
+        metric('host_latency_seconds', 'gauge', 'p99 total latency per host',
+               [({'host': host, 'quantile': 0.99}, round(values['p99'] / 1000, 6)) for host, values in hosts])
+        return '\n'.join(lines) + '\n'
+
+    def _rates(self, now: float, completed: int, host_counts: Dict[str, int]):
+        """Overall and per-host completions per second since the oldest sample within RATE_WINDOW"""
+        with self._samples_lock:
+            if not self._samples:
+                self._samples.append((self._start, 0, {}))
+            self._samples.append((now, completed, host_counts))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= RATE_WINDOW:
+                self._samples.popleft()
+            then, then_completed, then_hosts = self._samples[0]
+        span = now - then
+        if span <= 0:
+            return 0.0, {}
+        return (completed - then_completed) / span, {
+            host: (count - then_hosts.get(host, 0)) / span for host, count in host_counts.items()
+        }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        metrics = self.server.metrics
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            self._send(metrics.prometheus(), PROMETHEUS_CONTENT_TYPE)
+        elif path == '/metrics.json':
+            self._send(json.dumps(metrics.snapshot()), 'application/json')
+        else:
+            self.send_error(404, "Metrics are served at /metrics and /metrics.json")
+
+    def _send(self, text: str, content_type: str):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the progress output
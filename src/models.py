@@ -1,15 +1,50 @@
 """Core domain models for URL testing application"""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+import sys
 
 
-@dataclass
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_STATUS_CODES: Dict[object, object] = {}
+
+
+def intern_status(status_code):
+    """
+    Shared instance of a status code
+    
+    Ints above 256 and status strings would otherwise be separate objects
+    in every result; a run only ever sees a few dozen distinct codes.
+    """
+    if isinstance(status_code, str):
+        return sys.intern(status_code)
+    return _STATUS_CODES.setdefault(status_code, status_code)
+
+
+def format_timestamp(timestamp: float) -> str:
+    """Epoch seconds -> local 'YYYY-mm-dd HH:MM:SS' as shown in reports"""
+    return datetime.fromtimestamp(timestamp).strftime(TIMESTAMP_FORMAT) if timestamp else ''
+
+
+def parse_timestamp(value) -> float:
+    """Epoch seconds from a stored timestamp (a number, or the text form of older journals)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass(slots=True)
 class URLTestRequest:
     """Represents a URL to be tested"""
     url: str
     root_url: Optional[str] = None
+    attempt: int = 1  # 1 for the first check, incremented for every retry
+    lastmod: Optional[str] = None  # Sitemap <lastmod>, compared by incremental runs
     
     def get_full_url(self) -> str:
         """Construct full URL by combining root and path if needed"""
@@ -18,20 +53,47 @@ class URLTestRequest:
         return self.url
 
 
-@dataclass
+@dataclass(slots=True)
+class RequestTiming:
+    """Time spent in each phase of one check, in milliseconds"""
+    dns: float = 0.0  # Host lookup (near zero when the DNS cache already knows the host)
+    connect: float = 0.0  # TCP connects, including the handshakes of redirect hops
+    tls: float = 0.0  # TLS handshakes
+    ttfb: float = 0.0  # Start of the check until the first response headers arrived
+    total: float = 0.0  # Whole check, including redirects and any body read
+
+    def as_list(self) -> list:
+        return [round(value, 1) for value in (self.dns, self.connect, self.tls, self.ttfb, self.total)]
+
+
+@dataclass(frozen=True, slots=True)
 class TestResult:
-    """Represents the result of a URL test"""
+    """
+    Represents the result of a URL test
+    
+    One is built for every URL, so it is kept small: slotted, immutable,
+    with an interned status code and the time as epoch seconds (formatted
+    only when a failure is written to the report).
+    """
     source_url: str  # Original URL from Excel/sitemap
     tested_url: str  # Actual URL that was tested
     status_code: str | int
     error_message: str
-    tested_at: str
+    tested_at: float  # Epoch seconds (see tested_at_text)
+    timing: Optional[RequestTiming] = None
+    attempts: int = 1  # Checks made, including retries
+    retry_after: Optional[float] = field(default=None, repr=False)  # Server-requested delay (not reported)
+    duplicate_of: Optional[str] = None  # URL whose check this duplicate row reuses (None = checked itself)
     
     @property
     def is_success(self) -> bool:
         """Check if test was successful (status 200)"""
         return self.status_code == 200
     
+    @property
+    def tested_at_text(self) -> str:
+        return format_timestamp(self.tested_at)
+    
     def to_dict(self) -> dict:
         """Convert to dictionary for Excel export"""
         return {
@@ -39,15 +101,87 @@ class TestResult:
             'tested_url': self.tested_url,
             'status_code': str(self.status_code),
             'error_message': self.error_message,
-            'tested_at': self.tested_at
+            'tested_at': self.tested_at_text
         }
 
 
+class ResultCounts:
+    """Aggregate outcome counters, so successful results need not be kept as objects"""
+    __slots__ = ('success', 'errors', 'by_status')
+    
+    def __init__(self):
+        self.success = 0
+        self.errors = 0  # Failed results and checks that raised an exception
+        self.by_status: Dict[object, int] = {}
+    
+    @property
+    def total(self) -> int:
+        return self.success + self.errors
+    
+    def add(self, result: TestResult):
+        if result.is_success:
+            self.success += 1
+        else:
+            self.errors += 1
+        self.by_status[result.status_code] = self.by_status.get(result.status_code, 0) + 1
+
+
 @dataclass
 class TestConfig:
     """Configuration for URL testing"""
     max_workers: int = 100
     timeout: int = 5
-    delay: float = 0
+    delay: float = 0  # Legacy pacing, converted to a per-host rate of max_workers / delay
     user_agent: str = 'URL-Tester/1.0'
+    max_in_flight: int = 0  # URLs buffered or running at once (0 = 10 x max_workers)
+    host_rate_limit: float = 0  # Requests per second per host (0 = derive from delay)
+    host_burst: int = 1  # Requests a host may receive back to back before pacing applies
+    host_max_concurrent: int = 0  # Checks running at once per host (0 = unlimited)
+    input_file: str = ''  # .xlsx, .csv, text file (one URL per line) or '-' for stdin ('' = the mode's .xlsx)
+    input_root: str = ''  # Root URL for relative URLs; overrides the input's 'root' column (needed for text, stdin)
+    sitemap_workers: int = 8  # Sitemaps fetched concurrently in sitemap mode
+    sitemap_recursive: bool = False  # Follow sitemap indexes into their child sitemaps
+    sitemap_max_depth: int = 3  # Deepest nested index level followed in recursive mode
+    sitemap_max_fetches: int = 1000  # Maximum sitemaps downloaded per run in recursive mode
+    cache_path: str = ''  # SQLite file for ETag / Last-Modified revalidation ('' = disabled)
+    cache_max_entries: int = 1000000  # URLs kept in the cache (least recently checked evicted first)
+    cache_max_age: float = 7 * 86400  # Seconds a cached outcome may be reused
+    report_format: str = 'xlsx'  # 'xlsx', 'csv', 'jsonl' or 'parquet' (requires pyarrow)
+    engine: str = 'threaded'  # 'threaded' (thread pool), 'asyncio' (requires aiohttp) or 'http2' (requires httpx[http2])
+    http2_connections: int = 2  # HTTP/2 connections per origin in the http2 engine
+    http2_max_streams: int = 100  # Checks multiplexed on one HTTP/2 connection at once
+    http2_cleartext: bool = False  # Send http:// URLs as HTTP/2 with prior knowledge (HTTP/1.1 fallback)
+    check_method: str = 'get'  # 'head' (GET fallback on 405/501), 'stream' (headers only) or 'get' (full body)
+    max_body_bytes: int = 0  # Body bytes read before closing in 'stream' mode (0 = headers only)
+    dns_cache: bool = True  # Resolve each host once per run and fail unresolvable hosts fast
+    dns_ttl: float = 300  # Seconds a resolved address is reused
+    dns_negative_ttl: float = 60  # Seconds an unresolvable host is remembered
+    processes: int = 1  # Worker processes on this machine, each testing a share of the hosts
+    shard_index: int = 0  # This machine's shard (0-based) when splitting a run across machines
+    shard_count: int = 1  # Number of machine shards (1 = no sharding)
+    slow_threshold_ms: float = 0  # 200 responses slower than this are reported as SLOW (0 = disabled)
+    adaptive_concurrency: bool = False  # Learn each host's concurrency (max_workers becomes the upper bound)
+    adaptive_initial: int = 2  # Concurrent checks per host before the controller has measured it
+    adaptive_latency_factor: float = 2.0  # Back off when a host's p90 exceeds this multiple of its best p90
+    breaker_threshold: int = 5  # Consecutive connection errors/timeouts that mark a host down (0 = disabled)
+    breaker_cooldown: float = 30  # Seconds a down host's URLs fail as HOST_DOWN before it is probed again
+    max_retries: int = 0  # Retries of timeouts, connection errors, 429 and 502-504 per URL (0 = disabled)
+    retry_backoff: float = 0.5  # Base retry delay in seconds, doubled per attempt (with random jitter)
+    retry_backoff_max: float = 30  # Longest retry delay; a longer Retry-After is not waited for
+    retry_budget: float = 0.1  # Retries allowed per URL checked across the run (plus a small fixed allowance)
+    progress_interval: float = 1.0  # Seconds between progress lines
+    quiet: bool = False  # Do not echo failed URLs while testing (the report still has them all)
+    metrics_port: int = 0  # Serve live metrics at /metrics (Prometheus) and /metrics.json (0 = disabled)
+    metrics_host: str = '127.0.0.1'  # Address the metrics endpoint listens on
+    incremental: bool = False  # Re-test only new, changed (<lastmod>), previously failed and sampled URLs
+    incremental_state: str = 'url_state.db'  # SQLite file with each URL's <lastmod> and last outcome
+    incremental_sample: float = 0.05  # Share of unchanged URLs re-tested per incremental run (rolling)
+    dedupe: bool = True  # Check each canonical URL once; duplicate rows reuse its result
+    dedupe_rules: tuple = ('host', 'port', 'dots', 'fragment', 'query')  # Canonical form (+ 'slash')
+    dedupe_index: str = 'digest'  # 'digest' (64-bit hashes) or 'bloom' (fixed memory, rare false duplicates)
+    bloom_capacity: int = 10000000  # URLs the Bloom filter is sized for
+    bloom_error_rate: float = 0.001  # Share of unique URLs a full Bloom filter mistakes for duplicates
+    pool_connections: int = 0  # Hosts to keep connection pools for (0 = hosts being interleaved, up to 4 x max_workers)
+    pool_maxsize: int = 0  # Keep-alive connections per host (0 = max_workers)
+    pool_block: bool = False  # Wait for a free connection instead of exceeding pool_maxsize
 
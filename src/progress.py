@@ -0,0 +1,138 @@
+"""Progress reporting from a background thread, off the result-collection path"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from .models import ResultCounts, TestResult, URLTestRequest
+
+
+RATE_WINDOW = 10.0  # Seconds covered by the sliding-window rate (and used for the ETA)
+ERROR_ECHO_LIMIT = 20  # Error lines printed per tick; the rest are summarized in one line
+
+
+def format_duration(seconds: float) -> str:
+    """3725 -> '1h02m05s'"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressReporter:
+    """
+    Prints progress every `interval` seconds from its own thread
+
+    The collecting thread only bumps the ResultCounts it already keeps
+    and appends failures to a deque; it never takes a lock or writes to
+    the console. The reporter thread reads those counters (single
+    writer, so plain reads are consistent enough for a progress line),
+    derives the rates from its own samples and prints the queued error
+    lines in batches.
+    """
+
+    def __init__(self, counts: ResultCounts, engine, total: Optional[int] = None,
+                 interval: float = 1.0, quiet: bool = False):
+        """
+        Args:
+            counts: Counters updated by the result callbacks
+            engine: Running engine (in-flight snapshot, concurrency decisions, circuit events)
+            total: Number of URLs if known (percentage and ETA)
+            interval: Seconds between progress lines
+            quiet: Do not echo failed URLs
+        """
+        self.counts = counts
+        self.engine = engine
+        self.total = total
+        self.interval = interval
+        self.quiet = quiet
+        self._errors = deque()
+        self._samples = deque()  # (monotonic time, completed) of recent ticks
+        self._start = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._start = time.monotonic()
+        self._samples.append((self._start, self.counts.total))
+        self._thread = threading.Thread(target=self._loop, name='progress', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the ticker and print the last errors and a final progress line"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._tick()
+
+    def failure(self, result: TestResult):
+        """Queue a failed result for the next batch of error lines"""
+        if not self.quiet:
+            self._errors.append(f"[ERROR] {result.tested_url} → {result.status_code} {result.error_message}")
+
+    def exception(self, url_request: URLTestRequest, error: Exception):
+        if not self.quiet:
+            self._errors.append(f"[ERROR] Exception processing {url_request.url}: {str(error)}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._tick()
+
+    def _tick(self):
+        self._echo_errors()
+        concurrency = self.engine.concurrency
+        if concurrency is not None:
+            for decision in concurrency.drain_decisions():
+                print(f"[ADAPTIVE] {decision}")
+        breaker = self.engine.breaker
+        if breaker is not None:
+            for event in breaker.drain_events():
+                print(f"[CIRCUIT] {event}")
+        print(self._progress_line())
+
+    def _echo_errors(self):
+        printed = 0
+        while self._errors:
+            line = self._errors.popleft()
+            if printed < ERROR_ECHO_LIMIT:
+                print(line)
+            printed += 1
+        if printed > ERROR_ECHO_LIMIT:
+            print(f"[ERROR] ... and {printed - ERROR_ECHO_LIMIT} more errors in the last "
+                  f"{self.interval:g}s (all are in the report)")
+
+    def _progress_line(self) -> str:
+        counts = self.counts
+        completed = counts.total
+        now = time.monotonic()
+
+        last_time, last_completed = self._samples[-1]
+        instant = (completed - last_completed) / (now - last_time) if now > last_time else 0.0
+        self._samples.append((now, completed))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= RATE_WINDOW:
+            self._samples.popleft()
+        window_time, window_completed = self._samples[0]
+        window = (completed - window_completed) / (now - window_time) if now > window_time else 0.0
+        elapsed = now - self._start
+        overall = completed / elapsed if elapsed > 0 else 0.0
+
+        if self.total:
+            position = f"{completed}/{self.total} ({completed / self.total * 100:.1f}%)"
+        else:
+            position = f"{completed}"
+        line = (f"Progress: {position} - Success: {counts.success} | Errors: {counts.errors} | "
+                f"Rate: {instant:.1f} req/s ({RATE_WINDOW:g}s avg {window:.1f}, overall {overall:.1f}) | "
+                f"In flight: {self.engine.in_flight}")
+        if self.engine.queued:
+            line += f" (+{self.engine.queued} queued)"
+        if self.total and completed < self.total and window > 0:
+            line += f" | ETA {format_duration((self.total - completed) / window)}"
+        if self.engine.concurrency is not None:
+            limit = min(sum(self.engine.concurrency.limits()), self.engine.config.max_workers)
+            line += f" | Concurrency: {limit}"
+        return line
@@ -1,60 +1,114 @@
 """Report generation service"""
 
-from typing import List
+from typing import Iterable, List, Optional
 from datetime import datetime
 from .models import TestResult
-from .excel_handler import ExcelWriter
+from .report_writers import (REPORT_WRITERS, ReportWriter, create_report_writer,
+                             table_path, write_table_file)
 
 
 class ReportGenerator:
-    """Generates Excel reports from test results"""
-    
-    def __init__(self, mode: str):
+    """Generates reports from test results, writing rows as results arrive"""
+
+    def __init__(self, mode: str, output_format: str = 'xlsx'):
         """
         Args:
             mode: 'defined' or 'sitemap' - determines column headers
+            output_format: 'xlsx', 'csv', 'jsonl' or 'parquet'
         """
         self.mode = mode
-    
-    def generate_report(self, results: List[TestResult], output_file: str = None):
+        self.output_format = output_format
+        self.output_file = None
+        self.rows_written = 0
+        self._writer: Optional[ReportWriter] = None
+        self._tables = []
+
+    @property
+    def headers(self):
+        """Column headers based on mode"""
+        if self.mode == "defined":
+            return ['url_from_excel', 'tested_url', 'status_code', 'error_message', 'tested_at', 'attempts', 'duplicate_of']
+        else:  # sitemap
+            return ['url_from_sitemap', 'tested_url', 'status_code', 'error_message', 'tested_at', 'attempts', 'duplicate_of']
+
+    def open(self, output_file: str = None):
         """
-        Generate Excel report for failed tests
-        
+        Prepare a streaming report; the file is created with the first row
+
         Args:
-            results: List of test results (should only contain failures)
             output_file: Output file path (auto-generated if None)
         """
-        if not results:
-            print("\n[SUCCESS] No errors found! All URLs returned status 200.")
-            return
-        
+        if self.output_format not in REPORT_WRITERS:
+            raise ValueError(f"Invalid report format: {self.output_format}. "
+                             f"Must be one of: {', '.join(REPORT_WRITERS)}")
+
         # Generate output filename if not provided
         if output_file is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"test_results_{timestamp}.xlsx"
-        
-        # Prepare headers based on mode
-        if self.mode == "defined":
-            headers = ['url_from_excel', 'tested_url', 'status_code', 'error_message', 'tested_at']
-        else:  # sitemap
-            headers = ['url_from_sitemap', 'tested_url', 'status_code', 'error_message', 'tested_at']
-        
-        # Convert results to dictionaries
-        rows = []
-        for result in results:
-            row_dict = {
-                headers[0]: result.source_url,  # First header is the source column
-                'tested_url': result.tested_url,
-                'status_code': str(result.status_code),
-                'error_message': result.error_message,
-                'tested_at': result.tested_at
-            }
-            rows.append(row_dict)
-        
-        # Write to Excel
-        writer = ExcelWriter(output_file)
-        writer.write_data(headers, rows)
-        
-        print(f"\n[OK] Error report saved to: {output_file}")
-        print(f"[INFO] Total errors reported: {len(results)}")
+            output_file = f"test_results_{timestamp}.{self.output_format}"
+
+        self.output_file = output_file
+        self.rows_written = 0
+        self._writer = None
+        self._tables = []
+
+    def add_result(self, result: TestResult):
+        """Write one failed result to the report"""
+        if self._writer is None:
+            self._writer = create_report_writer(self.output_format, self.output_file, self.headers)
+
+        self._writer.write_row([
+            result.source_url,
+            result.tested_url,
+            str(result.status_code),
+            result.error_message,
+            result.tested_at_text,
+            result.attempts,
+            result.duplicate_of or ''
+        ])
+        self.rows_written += 1
 
+    def add_table(self, name: str, headers: List[str], rows: List[List]):
+        """
+        Include an additional table when the report is closed
+
+        It becomes an extra sheet of an xlsx report, or a file next to the
+        report for the other formats (also when there are no errors).
+        """
+        self._tables.append((name, headers, rows))
+
+    def close(self):
+        """Finalize the report and print where it was saved"""
+        tables, self._tables = self._tables, []
+        if self._writer is None:
+            print("\n[SUCCESS] No errors found! All URLs returned status 200.")
+            for name, headers, rows in tables:
+                location = write_table_file(self.output_format, table_path(self.output_file, name), headers, rows)
+                print(f"[OK] {name} table saved to: {location}")
+            return
+
+        locations = [self._writer.write_table(name, headers, rows) for name, headers, rows in tables]
+        self._writer.close()
+        self._writer = None
+
+        print(f"\n[OK] Error report saved to: {self.output_file}")
+        print(f"[INFO] Total errors reported: {self.rows_written}")
+        for (name, _, _), location in zip(tables, locations):
+            print(f"[OK] {name} table saved to: {location}")
+
+    def generate_report(self, results: Iterable[TestResult], output_file: str = None,
+                        tables: Iterable = ()):
+        """
+        Generate a report for failed tests in one go
+
+        Args:
+            results: Test results (should only contain failures)
+            output_file: Output file path (auto-generated if None)
+            tables: Additional (name, headers, rows) tables, see add_table
+        """
+        self.open(output_file)
+        for result in results:
+            self.add_result(result)
+        for table in tables:
+            self.add_table(*table)
+        self.close()
@@ -0,0 +1,162 @@
+"""Streaming report writers for the supported output formats"""
+
+import csv
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List
+
+
+class ReportWriter(ABC):
+    """Abstract base class for writers that append report rows as they arrive"""
+
+    extension = ''
+
+    def __init__(self, file_path: str, headers: List[str]):
+        self.file_path = file_path
+        self.headers = headers
+
+    @abstractmethod
+    def write_row(self, row: List):
+        """Append one row of values in header order"""
+        pass
+
+    @abstractmethod
+    def close(self):
+        """Flush and finalize the file"""
+        pass
+
+    def write_table(self, name: str, headers: List[str], rows: List[List]) -> str:
+        """
+        Write an additional table (e.g. latency percentiles) alongside the report
+
+        Formats without sheets write it to a separate file next to the report.
+
+        Returns:
+            Where the table was written, for the console
+        """
+        return write_table_file(self.extension, table_path(self.file_path, name), headers, rows)
+
+
+class ExcelReportWriter(ReportWriter):
+    """Write-only openpyxl workbook"""
+
+    extension = 'xlsx'
+
+    def __init__(self, file_path: str, headers: List[str]):
+        super().__init__(file_path, headers)
+        # Imported here so runs that write no workbook never load openpyxl
+        from .excel_handler import ExcelWriter
+        self._writer = ExcelWriter(file_path)
+        self._writer.open(headers)
+
+    def write_row(self, row: List):
+        self._writer.append(row)
+
+    def write_table(self, name: str, headers: List[str], rows: List[List]) -> str:
+        self._writer.add_sheet(headers, name)
+        for row in rows:
+            self._writer.append(row)
+        return f"{self.file_path} (sheet '{name}')"
+
+    def close(self):
+        self._writer.close()
+
+
+class CSVReportWriter(ReportWriter):
+    """Plain CSV with a header row"""
+
+    extension = 'csv'
+
+    def __init__(self, file_path: str, headers: List[str]):
+        super().__init__(file_path, headers)
+        # utf-8-sig so Excel opens non-ASCII URLs correctly
+        self._file = open(file_path, 'w', newline='', encoding='utf-8-sig')
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(headers)
+
+    def write_row(self, row: List):
+        self._csv.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class JSONLReportWriter(ReportWriter):
+    """One JSON object per line, keyed by the report headers"""
+
+    extension = 'jsonl'
+
+    def __init__(self, file_path: str, headers: List[str]):
+        super().__init__(file_path, headers)
+        self._file = open(file_path, 'w', encoding='utf-8')
+
+    def write_row(self, row: List):
+        self._file.write(json.dumps(dict(zip(self.headers, row)), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetReportWriter(ReportWriter):
+    """Compressed columnar Parquet file written in row groups (requires pyarrow)"""
+
+    extension = 'parquet'
+    ROW_GROUP_SIZE = 50000
+
+    def __init__(self, file_path: str, headers: List[str]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The parquet report format requires pyarrow (pip install pyarrow)")
+        super().__init__(file_path, headers)
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([(header, pyarrow.string()) for header in headers])
+        self._writer = pyarrow.parquet.ParquetWriter(file_path, self._schema, compression='zstd')
+        self._columns = [[] for _ in headers]
+
+    def write_row(self, row: List):
+        for column, value in zip(self._columns, row):
+            column.append(None if value is None else str(value))
+        if len(self._columns[0]) >= self.ROW_GROUP_SIZE:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def _flush(self):
+        if self._columns[0]:
+            self._writer.write_batch(self._pa.record_batch(self._columns, schema=self._schema))
+            self._columns = [[] for _ in self.headers]
+
+
+REPORT_WRITERS = {
+    writer.extension: writer
+    for writer in (ExcelReportWriter, CSVReportWriter, JSONLReportWriter, ParquetReportWriter)
+}
+
+
+def create_report_writer(output_format: str, file_path: str, headers: List[str]) -> ReportWriter:
+    """Factory method to create the writer for an output format"""
+    writer_cls = REPORT_WRITERS.get(output_format)
+    if writer_cls is None:
+        raise ValueError(f"Invalid report format: {output_format}. "
+                         f"Must be one of: {', '.join(REPORT_WRITERS)}")
+    return writer_cls(file_path, headers)
+
+
+def table_path(report_path: str, name: str) -> str:
+    """File used for an additional table, e.g. report.csv -> report_latency.csv"""
+    path = Path(report_path)
+    return str(path.with_name(f"{path.stem}_{name.lower()}{path.suffix}"))
+
+
+def write_table_file(output_format: str, file_path: str, headers: List[str], rows: List[List]) -> str:
+    """Write a complete table to its own file and return the path"""
+    writer = create_report_writer(output_format, file_path, headers)
+    for row in rows:
+        writer.write_row(row)
+    writer.close()
+    return file_path
@@ -0,0 +1,123 @@
+"""Retry policy for transient failures: backoff with jitter, Retry-After and a run-wide budget"""
+
+import heapq
+import itertools
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+
+from .models import URLTestRequest, TestResult, TestConfig
+
+
+RETRYABLE_STATUSES = ('TIMEOUT', 'CONNECTION_ERROR', 429, 502, 503, 504)
+RETRY_BUDGET_MIN = 10  # Retries always allowed, so small runs are not starved by the ratio
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delay-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed check is tried again
+
+    Delays grow exponentially from `backoff` with full jitter (a random
+    delay between 0 and the exponential value), so retries of many URLs
+    do not arrive in waves. A server's Retry-After wins when present; if
+    it asks for more than backoff_max the URL is not retried. Retries
+    come out of a budget of RETRY_BUDGET_MIN plus budget_ratio times the
+    URLs checked so far, so a dead host cannot multiply the load.
+    """
+
+    def __init__(self, max_retries: int = 2, backoff: float = 0.5, backoff_max: float = 30,
+                 budget_ratio: float = 0.1):
+        """
+        Args:
+            max_retries: Retries per URL after the first attempt
+            backoff: Base delay in seconds (doubled on every further attempt)
+            backoff_max: Longest delay, including one requested by Retry-After
+            budget_ratio: Retries allowed per URL checked, across the whole run
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.budget_ratio = budget_ratio
+        self.checked = 0
+        self.retries = 0
+        self.budget_exhausted = 0  # Retryable failures reported because the budget ran out
+
+    @classmethod
+    def from_config(cls, config: TestConfig) -> 'RetryPolicy':
+        return cls(
+            max_retries=config.max_retries,
+            backoff=config.retry_backoff,
+            backoff_max=config.retry_backoff_max,
+            budget_ratio=config.retry_budget
+        )
+
+    def retry_delay(self, url_request: URLTestRequest, result: TestResult,
+                    retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds after which to retry, or None to report the result as final
+
+        Args:
+            url_request: The request that produced the result (with its attempt number)
+            result: Outcome of the attempt
+            retry_after: Delay requested by the server, if any
+        """
+        if url_request.attempt == 1:
+            self.checked += 1
+        if result.status_code not in RETRYABLE_STATUSES or url_request.attempt > self.max_retries:
+            return None
+        if retry_after is not None and retry_after > self.backoff_max:
+            return None
+        if self.retries >= RETRY_BUDGET_MIN + self.budget_ratio * self.checked:
+            self.budget_exhausted += 1
+            return None
+
+        self.retries += 1
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff * 2 ** (url_request.attempt - 1), self.backoff_max))
+
+
+class DelayedRequests:
+    """Retries waiting for their due time, so no worker blocks while they wait"""
+
+    def __init__(self):
+        self._heap = []
+        self._order = itertools.count()  # Tie-breaker keeping equal due times in FIFO order
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, url_request: URLTestRequest, delay: float):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._order), url_request))
+
+    def pop_due(self) -> List[URLTestRequest]:
+        """Remove and return every request whose delay has passed"""
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the next request is due, or None if there are none"""
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - time.monotonic(), 0.0)
@@ -0,0 +1,114 @@
+"""Readers for URL input files that do not need openpyxl: CSV, plain text and stdin"""
+
+import csv
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO
+
+
+STDIN = '-'  # Input path that reads from standard input
+TEXT_SUFFIXES = ('.txt', '.lst', '.list')
+
+
+@contextmanager
+def _open_text(file_path: str) -> Iterator[TextIO]:
+    """Open a text input, or hand out stdin (left open) for '-'"""
+    if file_path == STDIN:
+        yield sys.stdin
+        return
+    # utf-8-sig drops the byte order mark that Excel puts in front of exported CSV files
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield f
+
+
+def _count_lines(file_path: str, skip_comments: bool = False) -> int:
+    """Count the non-blank lines of a file (optionally not those starting with '#')"""
+    with open(file_path, 'rb') as f:
+        return sum(1 for line in f if line.strip() and not (skip_comments and line.lstrip().startswith(b'#')))
+
+
+class CSVReader:
+    """Reads rows from a CSV file with a header row, like ExcelReader does from a workbook"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def exists(self) -> bool:
+        return self.file_path == STDIN or Path(self.file_path).exists()
+
+    def count_rows(self) -> Optional[int]:
+        """Number of data rows (None for stdin, which can only be read once)"""
+        if self.file_path == STDIN:
+            return None
+        return max(_count_lines(self.file_path) - 1, 0)  # Without the header row
+
+    def read_rows(self, required_columns: List[str]) -> Iterator[Dict[str, str]]:
+        """
+        Lazily read rows as dictionaries keyed by the header row
+
+        Raises:
+            ValueError: If required columns are missing (on the first iteration)
+        """
+        with _open_text(self.file_path) as f:
+            rows = csv.reader(f)
+            headers = [header.strip() for header in next(rows, [])]
+
+            missing_columns = [col for col in required_columns if col not in headers]
+            if missing_columns:
+                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+            col_indices = [(col, headers.index(col)) for col in headers if col]
+            for row in rows:
+                if row:
+                    yield {col_name: (row[col_idx].strip() or None) if col_idx < len(row) else None
+                           for col_name, col_idx in col_indices}
+
+
+class TextReader:
+    """
+    Reads one value per line from a text file or stdin
+
+    Blank lines and lines starting with '#' are skipped. Every line fills
+    `column`; the other required columns are None, so the providers treat
+    a text file like a spreadsheet with a single column.
+    """
+
+    def __init__(self, file_path: str, column: str):
+        self.file_path = file_path
+        self.column = column
+
+    def exists(self) -> bool:
+        return self.file_path == STDIN or Path(self.file_path).exists()
+
+    def count_rows(self) -> Optional[int]:
+        """Number of values (None for stdin, which can only be read once)"""
+        if self.file_path == STDIN:
+            return None
+        return _count_lines(self.file_path, skip_comments=True)
+
+    def read_rows(self, required_columns: List[str]) -> Iterator[Dict[str, str]]:
+        empty = dict.fromkeys(required_columns)
+        with _open_text(self.file_path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield dict(empty, **{self.column: line})
+
+
+def create_row_reader(file_path: str, column: str):
+    """
+    Pick a reader by file type
+
+    Args:
+        file_path: .xlsx, .csv or text file, or '-' for stdin (one value per line)
+        column: Column that each line of a text input fills
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.csv':
+        return CSVReader(file_path)
+    if file_path == STDIN or suffix in TEXT_SUFFIXES:
+        return TextReader(file_path, column)
+    # Imported here so CSV and text inputs never load openpyxl
+    from .excel_handler import ExcelReader
+    return ExcelReader(file_path)
@@ -0,0 +1,197 @@
+"""Per-host rate limiting and round-robin scheduling of URL checks"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .models import URLTestRequest, TestResult, TestConfig
+
+
+def host_of(url: str) -> str:
+    """Return the lowercase network location used to group URLs by host"""
+    return urlparse(url).netloc.lower()
+
+
+def effective_host_rate(config: TestConfig) -> float:
+    """
+    Requests per second allowed per host (0 = unlimited)
+
+    An explicit host_rate_limit wins. Otherwise the legacy delay setting
+    is converted: sleeping `delay` seconds in each of max_workers threads
+    capped a host at roughly max_workers / delay requests per second, and
+    the token bucket enforces that same cap without parking the workers.
+    """
+    if config.host_rate_limit > 0:
+        return config.host_rate_limit
+    if config.delay > 0:
+        return config.max_workers / config.delay
+    return 0
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: float) -> float:
+        """
+        Take one token if available
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class HostScheduler:
+    """
+    Buffers URLs per host and hands them out round-robin
+
+    A host is skipped while its token bucket is empty or it already has
+    max_concurrent checks running, so workers move on to other hosts
+    instead of waiting for a throttled one. With a concurrency controller,
+    the per-host limit comes from the controller instead. With a circuit
+    breaker, a host whose probe is running is skipped as well.
+    """
+
+    def __init__(self, rate: float = 0, burst: int = 1, max_concurrent: int = 0, concurrency=None,
+                 breaker=None):
+        """
+        Args:
+            rate: Requests per second per host (0 = unlimited)
+            burst: Requests a host may receive back to back before pacing applies
+            max_concurrent: Checks running at once per host (0 = unlimited)
+            concurrency: AdaptiveConcurrency that sets and learns each host's limit
+            breaker: CircuitBreaker that is told the outcome of every check
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_concurrent = max_concurrent
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self._queues: Dict[str, Deque[URLTestRequest]] = {}
+        self._hosts: Deque[str] = deque()  # Hosts with queued URLs, in round-robin order
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._active: Dict[str, int] = {}
+        self._queued = 0
+        self._wait: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: TestConfig, concurrency=None, breaker=None) -> 'HostScheduler':
+        return cls(
+            rate=effective_host_rate(config),
+            burst=config.host_burst,
+            max_concurrent=config.host_max_concurrent,
+            concurrency=concurrency,
+            breaker=breaker
+        )
+
+    def __len__(self) -> int:
+        """Number of buffered URLs not yet handed out"""
+        return self._queued
+
+    @property
+    def hosts(self) -> int:
+        """Upper bound on the hosts being interleaved (with URLs buffered or running)"""
+        return len(self._queues) + len(self._active)
+
+    def add(self, url_request: URLTestRequest):
+        """Buffer a URL under its host"""
+        host = host_of(url_request.get_full_url())
+        queue = self._queues.get(host)
+        if queue is None:
+            queue = self._queues[host] = deque()
+        if not queue:
+            self._hosts.append(host)
+        queue.append(url_request)
+        self._queued += 1
+
+    def pop_ready(self) -> Optional[Tuple[str, URLTestRequest]]:
+        """
+        Take the next URL whose host is within its limits
+
+        Returns:
+            (host, url_request), or None if every buffered host is throttled
+            (see wait_time) or the buffer is empty
+        """
+        now = time.monotonic()
+        self._wait = None
+
+        for _ in range(len(self._hosts)):
+            host = self._hosts.popleft()
+
+            limit = self.concurrency.limit(host) if self.concurrency is not None else self.max_concurrent
+            if limit and self._active.get(host, 0) >= limit:
+                self._hosts.append(host)
+                continue
+            if self.breaker is not None and self.breaker.probing(host):
+                self._hosts.append(host)
+                continue
+
+            if self.rate > 0:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+                wait = bucket.try_acquire(now)
+                if wait:
+                    self._hosts.append(host)
+                    self._wait = wait if self._wait is None else min(self._wait, wait)
+                    continue
+
+            queue = self._queues[host]
+            url_request = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._hosts.append(host)
+            else:
+                del self._queues[host]
+            self._active[host] = self._active.get(host, 0) + 1
+            return host, url_request
+
+        return None
+
+    def drop(self, host: str) -> List[URLTestRequest]:
+        """Remove and return every URL still buffered for a host"""
+        queue = self._queues.pop(host, None)
+        if not queue:
+            return []
+        self._hosts.remove(host)
+        self._queued -= len(queue)
+        return list(queue)
+
+    def wait_time(self) -> Optional[float]:
+        """
+        Seconds until a rate-limited host can be served again
+
+        Returns None when the last pop_ready found no host waiting on its
+        token bucket (the caller should wait for a running check instead).
+        """
+        return self._wait
+
+    def release(self, host: str, result: Optional[TestResult] = None):
+        """
+        Mark a check handed out by pop_ready as finished
+
+        Args:
+            host: Host returned by pop_ready
+            result: Outcome of the check, fed to the concurrency controller and the circuit breaker
+        """
+        if self.concurrency is not None and result is not None:
+            self.concurrency.observe(host, result)
+        if self.breaker is not None:
+            self.breaker.record(host, result)
+        active = self._active.get(host, 0) - 1
+        if active > 0:
+            self._active[host] = active
+        else:
+            self._active.pop(host, None)
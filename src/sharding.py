@@ -0,0 +1,240 @@
+"""Host-hash sharding across processes or machines, and merging of shard results"""
+
+import multiprocessing
+import queue
+import sys
+import zlib
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from .models import URLTestRequest, TestConfig
+from .input_feed import InputFeed
+from .journal import ResultJournal, JournalState
+from .report_generator import ReportGenerator
+from .scheduler import host_of
+from .url_tester import print_error_summary, print_latency_summary
+from .latency import LatencyStats, LATENCY_HEADERS
+from .incremental import SKIPPED_HEADERS
+from .url_providers import URLProvider
+
+
+SHARD_BATCH = 200  # URLs sent to a worker process at a time
+SHARD_QUEUE_BATCHES = 10  # Batches buffered per worker before the parent waits for it
+SHARD_INPUT_WAIT = 0.5  # Seconds the parent waits for the input before checking it again
+
+
+def shard_of(host: str, shard_count: int) -> int:
+    """
+    Shard that owns a host
+
+    crc32 is stable across processes and machines (unlike hash()), so
+    every shard agrees on the split without coordinating. Keeping a host
+    in one shard also keeps its rate limit and connection pool in one
+    process.
+    """
+    return zlib.crc32(host.encode('utf-8')) % shard_count
+
+
+def filter_shard(url_requests: Iterable[URLTestRequest],
+                 shard_index: int, shard_count: int) -> Iterator[URLTestRequest]:
+    """Yield only the URLs whose host belongs to the given shard"""
+    for url_request in url_requests:
+        if shard_of(host_of(url_request.get_full_url()), shard_count) == shard_index:
+            yield url_request
+
+
+def shard_path(file_path: str, shard_index: int, shard_count: int) -> str:
+    """Per-shard variant of a file name, e.g. journal.jsonl -> journal.shard2of4.jsonl"""
+    path = Path(file_path)
+    return str(path.with_name(f"{path.stem}.shard{shard_index + 1}of{shard_count}{path.suffix}"))
+
+
+def journal_file_for(mode: str) -> str:
+    """Default journal path for a mode"""
+    return f"test_journal_{mode}.jsonl"
+
+
+class ShardInput(URLProvider):
+    """URLs of one worker process, sent in batches by the parent that reads the input"""
+
+    def __init__(self, url_queue):
+        self.url_queue = url_queue
+
+    def get_urls(self) -> Iterator[URLTestRequest]:
+        while True:
+            batch = self.url_queue.get()
+            if batch is None:  # End of input
+                return
+            yield from batch
+
+
+def _run_shard(mode: str, config: TestConfig, url_queue, resume: bool):
+    """Process entry point: test one shard and leave its journal as the partial result"""
+    # Imported here because application.py imports this module
+    from .application import URLTestApplication
+    try:
+        URLTestApplication(mode, config, resume=resume, url_provider=ShardInput(url_queue),
+                           merge_hint=False).run()
+    except KeyboardInterrupt:
+        # The parent gets the same Ctrl+C and reports it; a traceback per worker would bury that
+        sys.exit(130)
+
+
+def _send(url_queue, worker, item):
+    """Queue an item for a worker, waiting while its queue is full (dropped if the worker has died)"""
+    while worker.is_alive():
+        try:
+            url_queue.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _distribute(url_requests: Iterable[URLTestRequest], config: TestConfig, queues, workers):
+    """Split the input by host into batches for the local shards, skipping other machines' hosts"""
+    processes = config.processes
+    shard_count = config.shard_count * processes
+    first_shard = config.shard_index * processes
+    batches = [[] for _ in queues]
+    # Read on a thread so a batch is sent as soon as the input pauses (a stalled sitemap,
+    # stdin) instead of waiting for it to fill
+    feed = InputFeed(url_requests, SHARD_BATCH * processes)
+    feed.start()
+    try:
+        while True:
+            url_request = feed.get()
+            if url_request is None:
+                for i, batch in enumerate(batches):
+                    if batch:
+                        _send(queues[i], workers[i], batch)
+                        batches[i] = []
+                if feed.exhausted:
+                    return
+                feed.wait(SHARD_INPUT_WAIT)
+                continue
+            i = shard_of(host_of(url_request.get_full_url()), shard_count) - first_shard
+            if 0 <= i < processes:
+                batches[i].append(url_request)
+                if len(batches[i]) >= SHARD_BATCH:
+                    _send(queues[i], workers[i], batches[i])
+                    batches[i] = []
+    finally:
+        feed.close()
+
+
+def run_local_shards(mode: str, config: TestConfig, url_provider: URLProvider,
+                     resume: bool = False) -> List[str]:
+    """
+    Split this machine's share of the URLs across config.processes worker processes
+
+    The input is read once, here, and each worker is sent the URLs of
+    its hosts, so sitemaps are downloaded once rather than by every
+    worker. Local shards are nested inside the machine shard, so
+    `processes` combines with shard_index / shard_count.
+
+    Returns:
+        Journal paths of the local shards (the partial results)
+    """
+    processes = config.processes
+    shard_count = config.shard_count * processes
+    configs = [
+        replace(
+            config,
+            processes=1,
+            shard_index=config.shard_index * processes + i,
+            shard_count=shard_count,
+            cache_path=shard_path(config.cache_path, config.shard_index * processes + i, shard_count)
+            if config.cache_path else '',
+            incremental_state=shard_path(config.incremental_state, config.shard_index * processes + i, shard_count),
+            metrics_port=config.metrics_port + i if config.metrics_port else 0  # One endpoint per worker
+        )
+        for i in range(processes)
+    ]
+
+    print(f"[INFO] Starting {processes} worker processes "
+          f"(shards {configs[0].shard_index + 1}-{configs[-1].shard_index + 1} of {shard_count})")
+    queues = [multiprocessing.Queue(SHARD_QUEUE_BATCHES) for _ in configs]
+    for url_queue in queues:
+        url_queue.cancel_join_thread()  # Batches left for a worker that died must not block exiting
+    workers = [
+        multiprocessing.Process(target=_run_shard, args=(mode, shard_config, url_queue, resume),
+                                name=f"shard-{shard_config.shard_index + 1}")
+        for shard_config, url_queue in zip(configs, queues)
+    ]
+    provided = None
+    try:
+        for worker in workers:
+            worker.start()
+        try:
+            provided = url_provider.get_urls()
+            _distribute(provided, config, queues, workers)
+        finally:
+            # End the input after an error too, so the workers finish the URLs they were sent
+            for url_queue, worker in zip(queues, workers):
+                _send(url_queue, worker, None)
+            if hasattr(provided, 'close'):
+                try:
+                    provided.close()
+                except ValueError:
+                    pass  # Still inside a blocked read on the input thread, which ends with the process
+            for worker in workers:
+                worker.join()
+    except KeyboardInterrupt:
+        # Workers receive the same Ctrl+C and close their journals themselves
+        for worker in workers:
+            worker.join()
+        raise
+
+    failed = [worker.name for worker in workers if worker.exitcode != 0]
+    if failed:
+        print(f"\n[WARNING] Worker processes failed: {', '.join(failed)} - "
+              f"their results are incomplete (re-run with --resume)")
+
+    return [shard_path(journal_file_for(mode), c.shard_index, c.shard_count) for c in configs]
+
+
+def merge_partials(journal_files: Iterable[str], mode: str,
+                   output_format: str = 'xlsx', output_file: str = None) -> JournalState:
+    """
+    Combine shard journals into a single report
+
+    Args:
+        journal_files: Partial result journals written by the shards
+        mode: 'defined' or 'sitemap' - determines column headers
+        output_format: Report format, as in TestConfig.report_format
+        output_file: Report path (auto-generated if None)
+
+    Returns:
+        Combined state of all shards
+    """
+    merged = JournalState()
+    latency = LatencyStats()
+    print("\n[INFO] Merging partial results...")
+    for journal_file in journal_files:
+        journal = ResultJournal(journal_file)
+        if not journal.exists():
+            print(f"[WARNING] Partial result not found: {journal_file}")
+            continue
+        state = journal.load(on_result=latency.record)
+        print(f"  {journal_file}: {len(state)} URLs, {len(state.failures)} errors")
+
+        merged.success_count += state.success_count
+        merged.failures.extend(state.failures)
+        merged.tested_rows.update(state.tested_rows)
+        merged.skipped.update(state.skipped)
+
+    print("=" * 60)
+    print("\n[OK] Merged results:")
+    print(f"  Total URLs tested: {len(merged)}")
+    print(f"  Successful (200): {merged.success_count}")
+    print(f"  Errors: {len(merged.failures)}")
+    print_latency_summary(latency)
+    print_error_summary(merged.failures)
+
+    tables = [('Latency', LATENCY_HEADERS, latency.rows())] if len(latency) else []
+    if merged.skipped:
+        print(f"  Skipped (unchanged, incremental run): {len(merged.skipped)}")
+        tables.append(('Skipped', SKIPPED_HEADERS, [merged.skipped[url] for url in sorted(merged.skipped)]))
+    ReportGenerator(mode, output_format).generate_report(merged.failures, output_file, tables)
+    return merged
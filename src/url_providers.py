@@ -1,74 +1,128 @@
 """URL source providers for different input methods"""
 
+import gzip
+import io
+import os
+import queue
+import threading
 from abc import ABC, abstractmethod
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
 import requests
 import xml.etree.ElementTree as ET
 from urllib.parse import urlparse
 
 from .models import URLTestRequest
-from .excel_handler import ExcelReader
+from .row_readers import STDIN, create_row_reader
+from .http_cache import ConditionalCache, TeeReader
+
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+GZIP_MAGIC = b'\x1f\x8b'
+SITEMAP_QUEUE_SIZE = 10000  # Parsed URLs waiting for the tester
 
 
 class URLProvider(ABC):
     """Abstract base class for URL providers"""
     
+    # Number of URLs the provider will yield, when known (set once get_urls has started)
+    total: Optional[int] = None
+    
     @abstractmethod
-    def get_urls(self) -> List[URLTestRequest]:
-        """Get list of URLs to test"""
+    def get_urls(self) -> Iterator[URLTestRequest]:
+        """Lazily yield URLs to test"""
         pass
 
 
 class DefinedListProvider(URLProvider):
-    """Provides URLs from a defined Excel list"""
+    """Provides URLs from a defined list (Excel, CSV, text file or stdin)"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, root_url: Optional[str] = None):
+        """
+        Args:
+            file_path: Input with 'root' and 'url' columns, or one URL per line (see create_row_reader)
+            root_url: Root for every relative URL, overriding the input's root column
+        """
         self.file_path = file_path
-        self.reader = ExcelReader(file_path)
+        self.root_url = root_url
+        self.reader = create_row_reader(file_path, column='url')
     
-    def get_urls(self) -> List[URLTestRequest]:
+    def get_urls(self) -> Iterator[URLTestRequest]:
         """
-        Load URLs from Excel file with 'root' and 'url' columns
+        Lazily load URLs from the input with 'root' and 'url' columns
         Root URL is read from first row and applied to all relative URLs
+        (an explicit root_url applies instead, to every row)
         """
         if not self.reader.exists():
             raise FileNotFoundError(f"File '{self.file_path}' not found!")
         
+        # Rows without a URL are rare, so the row count serves as the progress total
+        self.total = self.reader.count_rows()
         rows = self.reader.read_rows(required_columns=['root', 'url'])
+        print(f"\n[OK] Reading URLs from {'stdin' if self.file_path == STDIN else self.file_path}")
         
-        # Get root URL from first row with non-empty root
-        root_url = None
+        # The first root in the file applies to every relative URL; the ones
+        # seen before it are held back until it is known. A root given
+        # explicitly applies to every row instead, so nothing waits.
+        root_url = self.root_url
+        if root_url:
+            print(f"[OK] Root URL: {root_url}")
+        waiting = []
         for row in rows:
-            if row['root']:
+            if root_url is None and row['root']:
                 root_url = row['root']
-                break
+                print(f"[OK] Root URL: {root_url}")
+                for url in waiting:
+                    yield URLTestRequest(url=url, root_url=root_url)
+                waiting.clear()
+            if not row['url']:
+                continue
+            if root_url is None and not row['url'].startswith(('http://', 'https://')):
+                waiting.append(row['url'])
+            else:
+                yield URLTestRequest(url=row['url'], root_url=root_url)
         
-        # Create URL test requests
-        url_requests = []
-        for row in rows:
-            if row['url']:
-                url_requests.append(URLTestRequest(
-                    url=row['url'],
-                    root_url=root_url
-                ))
-        
-        print(f"\n[OK] Successfully loaded {len(url_requests)} URLs from defined list")
-        print(f"[OK] Root URL: {root_url}")
-        
-        return url_requests
+        for url in waiting:
+            yield URLTestRequest(url=url, root_url=None)
 
 
 class SitemapProvider(URLProvider):
     """Provides URLs by parsing sitemap XML files"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, workers: int = 8, recursive: bool = False,
+                 max_depth: int = 3, max_fetches: int = 1000,
+                 cache: Optional[ConditionalCache] = None, skip_repeats: bool = False):
+        """
+        Args:
+            file_path: Excel, CSV or text file (or '-' for stdin) listing the sitemaps
+            workers: Number of sitemaps fetched concurrently
+            recursive: Follow <sitemapindex> documents into their child sitemaps
+            max_depth: Deepest level of nested indexes to follow (listed sitemaps are level 0)
+            max_fetches: Maximum number of sitemaps downloaded in total
+            cache: Validator cache used to revalidate sitemaps from earlier runs
+            skip_repeats: Yield each URL string once (for runs without the engine's deduplication)
+        """
         self.file_path = file_path
-        self.reader = ExcelReader(file_path)
+        self.reader = create_row_reader(file_path, column='sitemap_url')
+        self.workers = workers
+        self.cache = cache
+        self.skip_repeats = skip_repeats
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.max_fetches = max_fetches
+        self.session = None
+        self._queue = None
+        self._stop = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._visited = set()
+        self._active = 0
     
-    def get_urls(self) -> List[URLTestRequest]:
+    def get_urls(self) -> Iterator[URLTestRequest]:
         """
-        Load URLs from sitemaps listed in Excel file
+        Load URLs from sitemaps listed in the input file
         Supports optional custom root URL for each sitemap
+        All sitemaps are fetched concurrently and URLs are yielded as soon as they are parsed
         """
         if not self.reader.exists():
             raise FileNotFoundError(f"File '{self.file_path}' not found!")
@@ -84,76 +138,216 @@ class SitemapProvider(URLProvider):
                 sitemaps.append((sitemap_url, custom_root))
         
         print(f"\n[OK] Found {len(sitemaps)} sitemap(s) to parse")
-        print("[INFO] Fetching URLs from sitemaps...")
+        if not sitemaps:
+            return
+        print(f"[INFO] Fetching URLs from sitemaps ({min(self.workers, len(sitemaps))} at a time)...")
+        if self.recursive:
+            print(f"[INFO] Following sitemap indexes (max depth {self.max_depth}, "
+                  f"max {self.max_fetches} sitemaps)")
+        
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._queue = queue.Queue(maxsize=SITEMAP_QUEUE_SIZE)
+        self._stop = threading.Event()
         
-        # Parse all sitemaps
-        all_urls = []
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._visited = set()
+        
+        # Hold one slot while submitting so early finishers can't signal completion
+        self._active = 1
         for idx, (sitemap_url, custom_root) in enumerate(sitemaps, 1):
-            print(f"[INFO] Parsing sitemap {idx}/{len(sitemaps)}: {sitemap_url}")
-            if custom_root:
-                print(f"[INFO] Will replace URL roots with: {custom_root}")
-            
-            urls = self._parse_sitemap(sitemap_url, custom_root)
-            all_urls.extend(urls)
-            print(f"[OK] Found {len(urls)} URLs in this sitemap")
+            self._submit(f"{idx}/{len(sitemaps)}", sitemap_url, custom_root, depth=0)
+        self._finish()
         
-        # Remove duplicates by URL string
-        unique_urls = []
-        seen = set()
-        for url_req in all_urls:
-            if url_req.url not in seen:
-                seen.add(url_req.url)
-                unique_urls.append(url_req)
+        # Yield URLs as workers parse them. Duplicates across sitemaps and
+        # index branches are normally left to the engine's Deduplicator, which
+        # recognizes them in canonical form without keeping every URL string;
+        # without it, exact repeats are skipped here as they always were
+        seen = set() if self.skip_repeats else None
+        count = 0
+        try:
+            while True:
+                url_req = self._queue.get()
+                if url_req is None:  # Every sitemap finished
+                    break
+                if seen is not None:
+                    if url_req.url in seen:
+                        continue
+                    seen.add(url_req.url)
+                count += 1
+                yield url_req
+        finally:
+            self._stop.set()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self.session.close()
         
-        print(f"\n[OK] Total unique URLs to test: {len(unique_urls)}")
+        print(f"[OK] All sitemaps parsed: {count} URLs")
+    
+    def _submit(self, label: str, sitemap_url: str, custom_root: Optional[str], depth: int) -> bool:
+        """Schedule a sitemap fetch unless it was already visited or a limit is reached"""
+        with self._lock:
+            if sitemap_url in self._visited:
+                print(f"[INFO] Skipped already fetched sitemap (cycle or duplicate): {sitemap_url}")
+                return False
+            if len(self._visited) >= self.max_fetches:
+                print(f"[WARNING] Sitemap fetch limit ({self.max_fetches}) reached, skipped: {sitemap_url}")
+                return False
+            self._visited.add(sitemap_url)
+            self._active += 1
         
-        return unique_urls
+        self._executor.submit(self._fetch_sitemap, label, sitemap_url, custom_root, depth)
+        return True
     
-    def _parse_sitemap(self, sitemap_url: str, custom_root: str = None) -> List[URLTestRequest]:
+    def _finish(self):
+        """Release one active slot; the last one tells the consumer that parsing is done"""
+        with self._lock:
+            self._active -= 1
+            done = self._active == 0
+        if done:
+            self._put(None)
+    
+    def _fetch_sitemap(self, label: str, sitemap_url: str, custom_root: str = None, depth: int = 0):
+        """Worker: parse one sitemap and push its URLs to the shared queue"""
+        count = 0
+        children = []
+        
+        def add_child(child_url: str):
+            if depth >= self.max_depth:
+                print(f"[WARNING] Sitemap depth limit ({self.max_depth}) reached, skipped: {child_url}")
+                return
+            if self._submit(f"{label}.{len(children) + 1}", child_url, custom_root, depth + 1):
+                children.append(child_url)
+        
+        try:
+            print(f"[INFO] Parsing sitemap {label}: {sitemap_url}")
+            if custom_root:
+                print(f"[INFO] Will replace URL roots with: {custom_root}")
+            
+            on_child = add_child if self.recursive else None
+            for url_req in self._parse_sitemap(sitemap_url, custom_root, on_child):
+                if not self._put(url_req):
+                    return
+                count += 1
+            
+            if children:
+                print(f"[OK] Found {len(children)} child sitemaps in sitemap index {label}")
+            else:
+                print(f"[OK] Found {count} URLs in sitemap {label}")
+            
+        except Exception as e:
+            print(f"[WARNING] Could not parse sitemap {sitemap_url}: {str(e)}")
+        finally:
+            self._finish()
+    
+    def _put(self, item) -> bool:
+        """Block until the consumer takes the item; False once it has stopped reading"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _parse_sitemap(self, sitemap_url: str, custom_root: str = None,
+                       on_child: Optional[Callable[[str], None]] = None) -> Iterator[URLTestRequest]:
         """
-        Parse a sitemap XML and extract URLs
-        Does NOT recursively crawl sitemap indices to avoid complexity
+        Stream a sitemap XML and yield URLs as they are parsed
+        Gzip-compressed sitemaps (.xml.gz) are decompressed on the fly
+        With a cache, unchanged sitemaps (304) are parsed from the local copy
         """
-        try:
-            response = requests.get(sitemap_url, timeout=30)
+        entry = self.cache.lookup(sitemap_url) if self.cache is not None else None
+        if entry is not None and not (entry.body_path and os.path.exists(entry.body_path)):
+            entry = None
+        headers = entry.conditional_headers() if entry else None
+        
+        with self.session.get(sitemap_url, timeout=30, stream=True, headers=headers) as response:
+            if response.status_code == 304 and entry is not None:
+                print(f"[INFO] Sitemap not modified, using cached copy: {sitemap_url}")
+                self.cache.revalidated(entry, sitemap=True)
+                with open(entry.body_path, 'rb') as cached_body:
+                    yield from self._iter_sitemap(cached_body, sitemap_url, custom_root, on_child)
+                return
+            
             response.raise_for_status()
+            response.raw.decode_content = True
+            response.raw.auto_close = False  # Let the reader see EOF instead of a closed file
             
-            root = ET.fromstring(response.content)
+            # Keep a copy of the body while parsing so the next run can revalidate it
+            body = response.raw
+            copy = None
+            if self.cache is not None and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+                body = copy = TeeReader(response.raw, self.cache.body_path_for(sitemap_url))
             
-            # Define XML namespaces
-            namespaces = {
-                'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9',
-                'news': 'http://www.google.com/schemas/sitemap-news/0.9',
-                'image': 'http://www.google.com/schemas/sitemap-image/1.1'
-            }
+            try:
+                complete = yield from self._iter_sitemap(body, sitemap_url, custom_root, on_child)
+            except BaseException:
+                if copy is not None:
+                    copy.discard()
+                raise
             
-            # Check if this is a sitemap index (contains other sitemaps)
-            sitemaps = root.findall('ns:sitemap', namespaces)
-            if sitemaps:
-                print(f"[INFO] Skipped sitemap index (contains other sitemaps): {sitemap_url}")
-                print(f"[INFO] If you need URLs from this, add the specific sitemap URLs to sitemaps.xlsx")
-                return []
+            if copy is not None:
+                if complete:
+                    self.cache.store(sitemap_url, response.status_code, response.headers, copy.commit())
+                else:
+                    copy.discard()
+    
+    def _iter_sitemap(self, stream, sitemap_url: str, custom_root: str = None,
+                      on_child: Optional[Callable[[str], None]] = None) -> Iterator[URLTestRequest]:
+        """
+        Incrementally parse a sitemap body, yielding URLs
+        Sitemap indices are only followed when on_child is given; it is
+        called with the location of every child sitemap
+        
+        Returns:
+            False if the document was skipped before the end (unfollowed index)
+        """
+        root = None
+        entry_tag = SITEMAP_NS + 'url'
+        for event, element in ET.iterparse(self._open_body(stream), events=('start', 'end')):
+            if root is None:
+                root = element
+                # Check if this is a sitemap index (contains other sitemaps)
+                if root.tag == SITEMAP_NS + 'sitemapindex':
+                    if on_child is None:
+                        print(f"[INFO] Skipped sitemap index (contains other sitemaps): {sitemap_url}")
+                        print(f"[INFO] If you need URLs from this, add the specific sitemap URLs to sitemaps.xlsx")
+                        return False
+                    entry_tag = SITEMAP_NS + 'sitemap'
+                continue
             
-            # Extract URLs from regular sitemap
-            url_requests = []
-            url_elements = root.findall('ns:url', namespaces)
+            if event != 'end' or element.tag != entry_tag:
+                continue
             
-            for url_element in url_elements:
-                loc = url_element.find('ns:loc', namespaces)
-                if loc is not None and loc.text:
-                    url = loc.text
-                    
+            loc = element.find(SITEMAP_NS + 'loc')
+            if loc is not None and loc.text:
+                url = loc.text.strip()
+                
+                if entry_tag != SITEMAP_NS + 'url':
+                    on_child(url)
+                else:
                     # Apply custom root if provided
                     if custom_root:
                         url = self._replace_url_root(url, custom_root)
                     
-                    url_requests.append(URLTestRequest(url=url))
+                    lastmod = element.find(SITEMAP_NS + 'lastmod')
+                    lastmod = lastmod.text.strip() if lastmod is not None and lastmod.text else None
+                    yield URLTestRequest(url=url, lastmod=lastmod)
             
-            return url_requests
-            
-        except Exception as e:
-            print(f"[WARNING] Could not parse sitemap {sitemap_url}: {str(e)}")
-            return []
+            # Drop parsed entries so memory stays flat
+            root.clear()
+        
+        return True
+    
+    @staticmethod
+    def _open_body(stream):
+        """Return a buffered file object over a sitemap body, gunzipping .xml.gz payloads"""
+        body = io.BufferedReader(stream)
+        if body.peek(2)[:2] == GZIP_MAGIC:
+            return gzip.GzipFile(fileobj=body)
+        return body
     
     def _replace_url_root(self, url: str, custom_root: str) -> str:
         """Replace the root/domain of a URL with a custom root"""
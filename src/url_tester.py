@@ -1,201 +1,258 @@
 """URL testing service with concurrent execution"""
 
 import time
-import threading
-from typing import List
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
-import requests
+from typing import Callable, Dict, Iterable, List, Optional
 
-from .models import URLTestRequest, TestResult, TestConfig
+from .models import URLTestRequest, TestResult, TestConfig, ResultCounts
+from .progress import ProgressReporter
+from .metrics import MetricsServer
+from .engines import create_engine
+from .journal import ResultJournal, JournalState
+from .http_cache import ConditionalCache
+from .incremental import IncrementalState
+from .scheduler import effective_host_rate, host_of
+from .latency import LatencyStats, LatencyHistogram
+
+
+SUMMARY_HOSTS = 10  # Slowest hosts listed in the console (the report lists all)
+
+
+def format_bytes(count: int) -> str:
+    """Format a byte count for the console summary"""
+    size = float(count)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{count} B"
+        size /= 1024
+
+
+def print_error_summary(results: List[TestResult]):
+    """Print failed results grouped by status code (first 5 URLs of each)"""
+    if not results:
+        return
+
+    print("\n" + "=" * 60)
+    print(f"ERROR SUMMARY ({len(results)} errors):")
+    print("=" * 60)
+    
+    # Group errors by status code
+    error_groups = {}
+    for result in results:
+        status = str(result.status_code)
+        if status not in error_groups:
+            error_groups[status] = []
+        error_groups[status].append(result.tested_url)
+    
+    # Print grouped errors
+    for status, urls in sorted(error_groups.items()):
+        print(f"\n[{status}] - {len(urls)} URL(s):")
+        for url in urls[:5]:  # Show first 5 of each type
+            print(f"  • {url}")
+        if len(urls) > 5:
+            print(f"  ... and {len(urls) - 5} more")
+
+
+def print_latency_summary(latency: LatencyStats):
+    """Print p50/p90/p99/max per phase, per status and for the slowest hosts"""
+    if not len(latency):
+        return
+
+    def line(label: str, histogram: LatencyHistogram):
+        print(f"  {label:<32} {histogram.count:>8} {histogram.percentile(50):>9.1f} "
+              f"{histogram.percentile(90):>9.1f} {histogram.percentile(99):>9.1f} {histogram.max:>9.1f}")
+
+    print("\n" + "=" * 60)
+    print("LATENCY (ms):")
+    print("=" * 60)
+    print(f"  {'':<32} {'count':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for phase, histogram in latency.phases.items():
+        line(phase, histogram)
+    print("\n  By status:")
+    for status, histogram in sorted(latency.by_status.items()):
+        line(f"[{status}]", histogram)
+    print("\n  Slowest hosts (by p99):")
+    for host, histogram in latency.slowest_hosts(SUMMARY_HOSTS):
+        line(host[:32], histogram)
 
 
 class URLTesterService:
     """Service for testing URLs concurrently"""
     
-    def __init__(self, config: TestConfig):
+    def __init__(self, config: TestConfig, journal: Optional[ResultJournal] = None,
+                 cache: Optional[ConditionalCache] = None,
+                 incremental: Optional[IncrementalState] = None):
+        """
+        Args:
+            config: Test configuration
+            journal: Open journal that every completed result is appended to
+            cache: Validator cache used to send conditional requests
+            incremental: State of an incremental run, updated with every result
+        """
         self.config = config
+        self.journal = journal
+        self.cache = cache
+        self.incremental = incremental
+        self.engine = None
+        self.latency = LatencyStats()
+        self.counts = ResultCounts()
     
-    def test_urls(self, url_requests: List[URLTestRequest]) -> List[TestResult]:
+    def test_urls(self, url_requests: Iterable[URLTestRequest],
+                  total: Optional[int] = None,
+                  previous: Optional[JournalState] = None,
+                  on_failure: Optional[Callable[[TestResult], None]] = None) -> List[TestResult]:
         """
         Test all URLs concurrently and return results
         
         Args:
-            url_requests: List of URL test requests
+            url_requests: URL test requests (list or lazy generator)
+            total: Number of URLs if known in advance (used for progress %)
+            previous: Results of an interrupted run that is being resumed
+            on_failure: Called with every failed result as soon as it arrives
             
         Returns:
-            List of test results (only failures, not 200 OK responses)
+            List of test results (only failures, not 200 OK responses),
+            including the failures of the resumed run
         """
-        total = len(url_requests)
-        results = []
-        completed = 0
-        success_count = 0
-        error_count = 0
+        if total is None and hasattr(url_requests, '__len__'):
+            total = len(url_requests)
+        results = list(previous.failures) if previous else []
+        counts = self.counts = ResultCounts()
         
         print(f"\n[INFO] Starting URL tests...")
-        print(f"[INFO] Max concurrent requests: {self.config.max_workers}")
+        print(f"[INFO] Engine: {self.config.engine} ({self.config.check_method.upper()} checks)")
+        if self.config.adaptive_concurrency:
+            print(f"[INFO] Adaptive concurrency: {self.config.adaptive_initial} per host to start, "
+                  f"at most {self.config.max_workers} in total")
+        else:
+            print(f"[INFO] Max concurrent requests: {self.config.max_workers}")
         print(f"[INFO] Timeout: {int(self.config.timeout * 1000)}ms per request")
-        if self.config.delay > 0:
-            print(f"[INFO] Delay: {int(self.config.delay * 1000)}ms between requests")
+        host_rate = effective_host_rate(self.config)
+        if host_rate > 0:
+            print(f"[INFO] Per-host rate limit: {host_rate:.1f} req/s")
         else:
-            print(f"[INFO] No delay - maximum speed")
+            print(f"[INFO] No per-host rate limit - maximum speed")
+        if self.config.host_max_concurrent:
+            print(f"[INFO] Per-host concurrency limit: {self.config.host_max_concurrent}")
+        if self.config.max_retries > 0:
+            print(f"[INFO] Retries: up to {self.config.max_retries} per URL "
+                  f"(backoff {self.config.retry_backoff}s, budget {self.config.retry_budget:.0%} of URLs)")
+        if self.config.quiet:
+            print("[INFO] Quiet mode: failed URLs are not echoed (they are all in the report)")
+        if self.config.slow_threshold_ms:
+            print(f"[INFO] Responses slower than {self.config.slow_threshold_ms:.0f}ms are reported as SLOW")
         print(f"[INFO] Press Ctrl+C to stop testing at any time")
         print("=" * 60)
         
         start_time = time.time()
-        lock = threading.Lock()
+        self.engine = create_engine(self.config, self.cache)
+        self.latency = LatencyStats()
+        progress = ProgressReporter(counts, self.engine, total,
+                                    interval=self.config.progress_interval, quiet=self.config.quiet)
         
-        def update_progress():
-            nonlocal completed
-            with lock:
-                completed += 1
-                # Show updates at intervals
-                if completed == 1 or completed % 10 == 0 or completed == total:
-                    progress = (completed / total) * 100
-                    elapsed = time.time() - start_time
-                    rate = completed / elapsed if elapsed > 0 else 0
-                    print(f"Progress: {completed}/{total} ({progress:.1f}%) - "
-                          f"Success: {success_count} | Errors: {error_count} | "
-                          f"Rate: {rate:.1f} req/s")
+        # Results per host for the live metrics; the latency histograms leave out results without timing
+        host_counts = {} if self.config.metrics_port else None
         
-        # Submit all tasks to thread pool
-        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
-            futures = {}
-            
-            print(f"[INFO] Submitting {total} URLs to thread pool...")
-            
-            for url_request in url_requests:
-                future = executor.submit(self._test_single_url, url_request)
-                futures[future] = url_request
-            
-            print(f"[INFO] All URLs submitted! Processing results as they complete...")
-            
-            # Process results as they complete
-            try:
-                for future in as_completed(futures):
-                    url_request = futures[future]
-                    try:
-                        result = future.result()
-                        
-                        if result.is_success:
-                            with lock:
-                                success_count += 1
-                        else:
-                            with lock:
-                                error_count += 1
-                            results.append(result)
-                            # Print error immediately to console
-                            print(f"[ERROR] {result.tested_url} → {result.status_code} {result.error_message}")
-                        
-                        update_progress()
-                        
-                    except Exception as e:
-                        with lock:
-                            error_count += 1
-                        print(f"[ERROR] Exception processing {url_request.url}: {str(e)}")
-                        update_progress()
-            except KeyboardInterrupt:
-                print("\n\n[WARNING] Stopping tests... (waiting for active requests to finish)")
-                executor.shutdown(wait=False, cancel_futures=True)
-                raise
+        def count_host(url: str):
+            host = host_of(url)
+            host_counts[host] = host_counts.get(host, 0) + 1
+        
+        def handle_result(result: TestResult):
+            if self.journal is not None:
+                self.journal.write(result)
+            if self.incremental is not None:
+                self.incremental.record(result)
+            self.latency.record(result)
+            counts.add(result)
+            if host_counts is not None:
+                count_host(result.tested_url)
+            if not result.is_success:
+                results.append(result)
+                if on_failure is not None:
+                    on_failure(result)
+                progress.failure(result)
+        
+        def handle_error(url_request: URLTestRequest, error: Exception):
+            if self.incremental is not None:
+                self.incremental.discard(url_request)
+            counts.errors += 1
+            if host_counts is not None:
+                count_host(url_request.get_full_url())
+            progress.exception(url_request, error)
+        
+        metrics = self._start_metrics(counts, host_counts, total)
+        progress.start()
+        try:
+            self.engine.run(url_requests, handle_result, handle_error)
+        except KeyboardInterrupt:
+            print("\n\n[WARNING] Stopping tests... (waiting for active requests to finish)")
+            raise
+        finally:
+            progress.stop()
+            if metrics is not None:
+                metrics.stop()
         
         # Print summary
         elapsed = time.time() - start_time
         print("=" * 60)
         print(f"\n[OK] Testing complete!")
-        print(f"  Total URLs tested: {total}")
-        print(f"  Successful (200): {success_count}")
-        print(f"  Errors: {error_count}")
+        print(f"  Total URLs tested: {counts.total}")
+        print(f"  Successful (200): {counts.success}")
+        print(f"  Errors: {counts.errors}")
+        if previous:
+            print(f"  Resumed from journal: {len(previous)} earlier results "
+                  f"({len(previous.failures)} errors)")
+        if self.incremental is not None:
+            print(f"  Incremental: {self.incremental.summary()}")
         print(f"  Total time: {elapsed:.1f} seconds")
-        print(f"  Average rate: {total/elapsed:.1f} requests/second")
+        print(f"  Average rate: {counts.total/elapsed:.1f} requests/second")
+        connection_stats = self.engine.connection_stats
+        print(f"  Connections: {connection_stats.opened} opened, "
+              f"{connection_stats.reused} reused")
+        print(f"  Bytes transferred: {format_bytes(connection_stats.bytes_received)} (response bodies)")
+        if connection_stats.http_versions:
+            print("  Protocols: " + ", ".join(f"{version} {count}" for version, count
+                                             in sorted(connection_stats.http_versions.items(), reverse=True)))
+        if self.cache is not None:
+            print(f"  Not modified (304, cached outcome used): {self.cache.hits}")
+        concurrency = self.engine.concurrency
+        if concurrency is not None and concurrency.limits():
+            limits = sorted(concurrency.limits())
+            print(f"  Adaptive concurrency per host: min {limits[0]}, "
+                  f"median {limits[len(limits) // 2]}, max {limits[-1]}")
+        breaker = self.engine.breaker
+        if breaker is not None and breaker.opened:
+            print(f"  Hosts marked down: circuit opened {breaker.opened} times, {breaker.recovered} recovered; "
+                  f"{counts.by_status.get('HOST_DOWN', 0)} URLs failed fast as HOST_DOWN")
+        dedupe = self.engine.dedupe
+        if dedupe is not None and dedupe.duplicates:
+            print(f"  Duplicates: {dedupe.duplicates} URLs answered from an identical check "
+                  f"({dedupe.unique} unique URLs checked)")
+        retry = self.engine.retry
+        if retry is not None:
+            print(f"  Retries: {retry.retries}"
+                  + (f" ({retry.budget_exhausted} not retried, budget exhausted)" if retry.budget_exhausted else ""))
+        dns_cache = self.engine.dns_cache
+        if dns_cache is not None:
+            print(f"  DNS: {dns_cache.resolved_count} hosts resolved, "
+                  f"{dns_cache.failed_count} unresolvable")
         
-        # Print error summary if there are errors
-        if results:
-            print("\n" + "=" * 60)
-            print(f"ERROR SUMMARY ({len(results)} errors):")
-            print("=" * 60)
-            
-            # Group errors by status code
-            error_groups = {}
-            for result in results:
-                status = str(result.status_code)
-                if status not in error_groups:
-                    error_groups[status] = []
-                error_groups[status].append(result.tested_url)
-            
-            # Print grouped errors
-            for status, urls in sorted(error_groups.items()):
-                print(f"\n[{status}] - {len(urls)} URL(s):")
-                for url in urls[:5]:  # Show first 5 of each type
-                    print(f"  • {url}")
-                if len(urls) > 5:
-                    print(f"  ... and {len(urls) - 5} more")
+        print_latency_summary(self.latency)
+        print_error_summary(results)
         
         return results
     
-    def _test_single_url(self, url_request: URLTestRequest) -> TestResult:
-        """Test a single URL and return result"""
-        full_url = url_request.get_full_url()
-        
+    def _start_metrics(self, counts: ResultCounts, host_counts: Optional[Dict[str, int]],
+                       total: Optional[int]) -> Optional[MetricsServer]:
+        """Serve live metrics if configured; a port that cannot be opened only costs the endpoint"""
+        if not self.config.metrics_port:
+            return None
         try:
-            # Add delay if configured (rate limiting)
-            if self.config.delay > 0:
-                time.sleep(self.config.delay)
-            
-            response = requests.get(
-                full_url,
-                timeout=self.config.timeout,
-                allow_redirects=True,
-                headers={
-                    'User-Agent': self.config.user_agent,
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive'
-                }
-            )
-            
-            status_code = response.status_code
-            error_msg = '' if status_code == 200 else f'HTTP {status_code}'
-            
-            return TestResult(
-                source_url=url_request.url,
-                tested_url=full_url,
-                status_code=status_code,
-                error_message=error_msg,
-                tested_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-            
-        except requests.exceptions.Timeout:
-            return TestResult(
-                source_url=url_request.url,
-                tested_url=full_url,
-                status_code='TIMEOUT',
-                error_message=f'Request timed out (>{int(self.config.timeout * 1000)}ms)',
-                tested_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-        except requests.exceptions.ConnectionError:
-            return TestResult(
-                source_url=url_request.url,
-                tested_url=full_url,
-                status_code='CONNECTION_ERROR',
-                error_message='Connection failed',
-                tested_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-        except requests.exceptions.TooManyRedirects:
-            return TestResult(
-                source_url=url_request.url,
-                tested_url=full_url,
-                status_code='TOO_MANY_REDIRECTS',
-                error_message='Too many redirects',
-                tested_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-        except Exception as e:
-            return TestResult(
-                source_url=url_request.url,
-                tested_url=full_url,
-                status_code='ERROR',
-                error_message=str(e),
-                tested_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-
+            metrics = MetricsServer(counts, host_counts, self.latency, self.engine, total,
+                                    port=self.config.metrics_port, host=self.config.metrics_host)
+        except OSError as e:
+            print(f"[WARNING] Live metrics disabled: cannot listen on "
+                  f"{self.config.metrics_host}:{self.config.metrics_port} ({e.strerror or e})")
+            return None
+        metrics.start()
+        print(f"[INFO] Live metrics: {metrics.url} (Prometheus), {metrics.url}.json (JSON)")
+        return metrics